@@ -0,0 +1,40 @@
+# adb.py - 数据库异步封装
+# 在异步请求路径（asgi.py）中调用 db.py 的同步函数，例如：
+#     history = await adb.run(db.get_chat_history, session_id, 5)
+# sqlite3 调用是阻塞的，统一放到一个小的专用线程池中执行，避免阻塞事件循环
+
+import asyncio  # 异步IO
+import contextvars  # 把调用方的上下文（如性能分析记录）带到线程中
+import functools  # 绑定函数参数
+import os  # 读取线程池大小
+from concurrent.futures import ThreadPoolExecutor  # 线程池
+
+# 数据库操作都很短，少量线程即可；SQLite 同一时间也只允许一个写入者
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_THREADS", "8")),
+    thread_name_prefix="adb",
+)
+
+
+async def run(func, *args, **kwargs):
+    """
+    在数据库线程池中执行同步函数
+
+    Args:
+        func (callable): 要执行的同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数的返回值
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown():
+    """
+    关闭线程池（应用关闭时调用）
+    """
+    _executor.shutdown(wait=True)
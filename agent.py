@@ -1,114 +1,64 @@
 # agent.py  —— 英语学习 AI 助手（CET-6 / 金融 / 学术阅读）
 
-import os
+import sys
 import hashlib
-import sqlite3
-from datetime import datetime
-from plyer import notification
-from docx import Document
+import threading
+import analytics
+import db
+import export
+import profiling
+import sampler
+from config import DEFAULT_SAVE_FOLDER, load_config
 from llm import generate_code
+from passage import clean_markdown
+from prompt import reading_prompt
+
+# plyer 和 python-docx 导入较慢，只在首次使用时导入（见 notify / save_to_word）
 
 # =========================
 # 配置
 # =========================
-# 定义保存文件的文件夹路径
-SAVE_FOLDER = r"E:\English_text"
-# 确保保存文件夹存在，如果不存在则创建
-os.makedirs(SAVE_FOLDER, exist_ok=True)
+# 定义保存文件的文件夹路径，启动时由 configure() 按配置覆盖
+SAVE_FOLDER = DEFAULT_SAVE_FOLDER
+
 
-# 定义数据库文件的路径
-DB_PATH = os.path.join(SAVE_FOLDER, "english_learning.db")
+# 应用配置（保存目录、数据库路径和文章规格）
+def configure(config):
+    global SAVE_FOLDER
+    SAVE_FOLDER = config["SAVE_FOLDER"]
+    db.configure(config["DB_PATH"])
+    analytics.configure(config)
 
 # =========================
 # 数据库
 # =========================
-# 初始化数据库
-def init_db():
-    # 连接到 SQLite 数据库
-    conn = sqlite3.connect(DB_PATH)
-    # 创建一个游标对象
-    c = conn.cursor()
-
-    # 创建 learning_state 表，如果它不存在的话
-    # 这个表用于存储学习状态，包括主题、步骤和内容
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS learning_state (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        topic TEXT,
-        step INTEGER,
-        content TEXT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-    # 创建 sent_hash 表，如果它不存在的话
-    # 这个表用于存储已发送内容的哈希值，以避免重复发送
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS sent_hash (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        hash TEXT UNIQUE
-    )
-    """)
-
-    # 提交事务
-    conn.commit()
-    # 关闭数据库连接
-    conn.close()
-
-# 获取当前的学习状态
-def get_state():
-    # 连接到数据库
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # 从 learning_state 表中查询最新的主题和步骤
-    c.execute("SELECT topic, step FROM learning_state ORDER BY id DESC LIMIT 1")
-    # 获取查询结果
-    row = c.fetchone()
-    # 关闭数据库连接
-    conn.close()
-    # 如果查询到结果，则返回结果，否则返回默认值
-    return row if row else ("English Reading", 0)
-
-# 保存学习状态
-def save_state(topic, step, content):
-    # 连接到数据库
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # 向 learning_state 表中插入新的状态记录
-    c.execute(
-        "INSERT INTO learning_state (topic, step, content) VALUES (?, ?, ?)",
-        (topic, step, content)
-    )
-    # 提交事务
-    conn.commit()
-    # 关闭数据库连接
-    conn.close()
-
-# 检查一个哈希值是否存在于数据库中
-def is_sent(h):
-    # 连接到数据库
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # 在 sent_hash 表中查询指定的哈希值
-    c.execute("SELECT 1 FROM sent_hash WHERE hash=?", (h,))
-    # 获取查询结果
-    res = c.fetchone()
-    # 关闭数据库连接
-    conn.close()
-    # 如果查询到结果，则返回 True，否则返回 False
-    return res is not None
-
-# 将一个哈希值标记为已发送
-def mark_sent(h):
-    # 连接到数据库
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # 向 sent_hash 表中插入新的哈希值，如果已存在则忽略
-    c.execute("INSERT OR IGNORE INTO sent_hash (hash) VALUES (?)", (h,))
-    # 提交事务
-    conn.commit()
-    # 关闭数据库连接
-    conn.close()
+# 所有表的结构和读写都在 db.py 中，这里只保留代理使用的名称
+
+# 初始化数据库（执行尚未执行的迁移）
+init_db = db.init_db
+
+# 获取当前的学习状态 (主题, 步骤)
+get_state = db.get_latest_state
+
+# 检查一个哈希值是否已发送 / 将一个哈希值标记为已发送
+is_sent = db.is_content_sent
+mark_sent = db.mark_content_sent
+
+# 记录一次生成的选题和重试情况
+log_generation = db.log_generation
+
+# 预生成阅读：保存、统计未发放数量、领取最早的一篇
+save_prepared_reading = db.save_prepared_reading
+count_prepared_readings = db.count_prepared_readings
+claim_prepared_reading = db.claim_prepared_reading
+
+# 保存学习状态，同时在同一事务中保存阅读的统计数据
+# stats 为 analytics.analyze() 的结果，未提供时在这里计算
+def save_state(topic, step, content, stats=None):
+    if stats is None:
+        stats = analytics.analyze(content)
+    # 返回新记录的 ID
+    return db.save_learning_state(topic, step, content, stats)
 
 # =========================
 # 工具
@@ -118,19 +68,32 @@ def sha(text):
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 # 发送桌面通知
-def notify(msg):
-    notification.notify(
-        title="📘 Daily English Reading",
-        message=msg,
-        timeout=15
-    )
+# 在后台线程中发送，不阻塞生成流程；没有桌面环境时忽略错误
+# wait 为等待发送完成的最长秒数：发送后进程即将退出时（如 schedule --once）需要等待，
+# 否则守护线程会随进程结束，通知被丢弃
+def notify(msg, wait=None):
+    def send():
+        try:
+            from plyer import notification
+            notification.notify(
+                title="📘 Daily English Reading",
+                message=msg,
+                timeout=15
+            )
+        except Exception as e:
+            print("发送桌面通知失败:", e)
+
+    thread = threading.Thread(target=send, daemon=True)
+    thread.start()
+    if wait:
+        thread.join(wait)
 
 # 将文本保存到 Word 文档
+@profiling.timed("docx")
 def save_to_word(text):
-    # 生成文件名，包含当前日期
-    filename = f"English_Reading_{datetime.today().strftime('%Y%m%d')}.docx"
-    # 拼接文件的完整路径
-    path = os.path.join(SAVE_FOLDER, filename)
+    from docx import Document
+    # 生成文件名，包含当前日期；同一天的第二篇起加 _2、_3，不会覆盖之前的文件
+    path = export.reserve_path(SAVE_FOLDER, "English_Reading", "docx")
 
     # 创建一个新的 Word 文档
     doc = Document()
@@ -146,64 +109,78 @@ def save_to_word(text):
 # =========================
 # 核心：生成每日英语阅读
 # =========================
-# 生成每日英语阅读内容
-def generate_daily_reading():
+# 调用 LLM 生成一篇新的阅读（含去重和保存学习状态），失败返回 None
+def generate_reading():
     # 获取当前的学习状态
-    topic, step = get_state()
-
-    # 定义生成内容的提示（prompt）
-    prompt = f"""
-You are an advanced English learning assistant.
-
-Task:
-Generate a high-quality English reading passage suitable for CET-6 level learners.
-
-Requirements:
-1. Topic should be ONE of the following:
-   - Finance & Economics
-   - Academic Research
-   - Science & Technology
-   - Famous Speeches or Intellectual Essays
-2. Length: 600–900 words
-3. Style: formal, logical, well-structured
-4. After the passage, provide 5–8 English comprehension questions
-5. DO NOT provide answers
-6. Content must be original and not repeated
-
-Output format:
-Title
----
-Reading Passage
----
-Questions
-"""
+    _, step = get_state()
+
+    # 按已生成内容的分布选定领域、子话题和文体，减少雷同输出
+    counts = sampler.recent_counts()
+    tried = []
+    attempts = duplicates = rejected = empty = 0
+    choice = None
 
     # 尝试最多 5 次来生成内容
     for _ in range(5):
+        # 每次尝试重新选题，并避开本次已经尝试过的子话题
+        choice = sampler.sample(counts, exclude=tried)
+        tried.append(choice["subtopic"])
+        # 定义生成内容的提示（prompt）
+        prompt = reading_prompt(choice["domain"], choice["subtopic"], choice["style"])
+
         # 调用 llm 模块的 generate_code 函数生成内容
-        result = generate_code(prompt)
+        # 600–900 词的文章加题目约需 1500 个 token，默认的 800 会截断
+        attempts += 1
+        result = generate_code(prompt, max_tokens=2048)
         # 如果生成失败，则继续下一次尝试
         if not result:
+            empty += 1
             continue
 
+        # 去掉 Markdown 标记后再统计和保存，"**1.**"、"### Questions" 等格式不影响题目计数
+        result = clean_markdown(result)
+
         # 计算生成内容的哈希值
         h = sha(result)
         # 如果内容已经发送过，则继续下一次尝试
         if is_sent(h):
+            duplicates += 1
+            continue
+
+        # 统计词数和题目数，不符合要求的文章不保存也不导出
+        stats = analytics.analyze(result)
+        problems = analytics.check_spec(stats)
+        if problems:
+            rejected += 1
+            print("生成的文章不符合要求:", "; ".join(problems))
             continue
 
         # 将新内容的哈希值标记为已发送
         mark_sent(h)
-        # 保存新的学习状态
-        save_state(topic, step + 1, result)
-
-        # 将生成的内容保存到 Word 文档
-        file_path = save_to_word(result)
-        # 返回生成的内容和文件路径
-        return result, file_path
+        # 保存新的学习状态（主题记录为本次的领域）
+        state_id = save_state(choice["domain"], step + 1, result, stats)
+        log_generation(state_id, choice, attempts, duplicates, rejected, empty)
+        return result
 
     # 如果 5 次尝试都失败，则返回 None
-    return None, None
+    if choice:
+        log_generation(None, choice, attempts, duplicates, rejected, empty)
+    return None
+
+# 获取今日阅读：优先领取调度器预生成的阅读，没有时当场生成
+def get_reading():
+    return claim_prepared_reading() or generate_reading()
+
+# 生成每日英语阅读内容
+def generate_daily_reading():
+    content = get_reading()
+    if not content:
+        return None, None
+
+    # 将生成的内容保存到 Word 文档
+    file_path = save_to_word(content)
+    # 返回生成的内容和文件路径
+    return content, file_path
 
 # =========================
 # 交互
@@ -250,7 +227,19 @@ def chat():
 # =========================
 # 如果该脚本是作为主程序运行
 if __name__ == "__main__":
+    # 加载配置（.env / 环境变量）
+    config = load_config()
+    configure(config)
     # 初始化数据库
     init_db()
-    # 启动聊天交互
-    chat()
+
+    # python agent.py schedule [--once]：低峰期预生成阅读的调度器
+    if len(sys.argv) > 1 and sys.argv[1] == "schedule":
+        import scheduler
+        scheduler.main(config, once="--once" in sys.argv[2:])
+    # python agent.py export [--since ...] [--until ...] [--format docx|md]：导出阅读合集
+    elif len(sys.argv) > 1 and sys.argv[1] == "export":
+        export.main(config, sys.argv[2:])
+    else:
+        # 启动聊天交互
+        chat()
@@ -0,0 +1,214 @@
+# analytics.py - 阅读材料统计模块
+# 在保存阅读材料时计算一次词数、词汇等级覆盖率和可读性，
+# 结果由 db.save_learning_state() 以紧凑的一行存入 passage_stats 表，汇总查询只需扫描这张小表
+
+import os  # 操作系统接口模块
+import re  # 正则表达式模块，用于分词和分句
+from collections import Counter  # 词频统计
+from functools import lru_cache  # 缓存词表和音节数
+
+import db  # 数据库模块
+from passage import parse_passage  # 阅读材料结构化解析
+
+# 随仓库附带的词汇等级表
+VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vocabulary.tsv")
+
+# 提示词要求 600–900 词，允许 10% 的误差；超出范围的文章在保存前被拒绝
+# 由 configure() 按配置（PASSAGE_MIN_WORDS / PASSAGE_MAX_WORDS）覆盖
+MIN_WORDS = 540
+MAX_WORDS = 990
+# 提示词要求 5–8 道理解题
+MIN_QUESTIONS = 5
+MAX_QUESTIONS = 8
+
+# 英文单词（含撇号和连字符）
+WORD_RE = re.compile(r"[A-Za-z]+(?:['\-][A-Za-z]+)*")
+# 句末标点
+SENTENCE_RE = re.compile(r"[.!?]+(?=\s|$)")
+# 元音组，用于估算音节数
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+# 词形还原时依次尝试去掉的后缀及替换
+SUFFIXES = (("ies", "y"), ("ied", "y"), ("es", ""), ("s", ""), ("ed", ""), ("ed", "e"),
+            ("d", ""), ("ing", ""), ("ing", "e"), ("ly", ""))
+
+
+def configure(config):
+    """
+    应用配置（文章词数的允许范围）
+
+    Args:
+        config (dict): 配置字典（PASSAGE_MIN_WORDS / PASSAGE_MAX_WORDS）
+    """
+    global MIN_WORDS, MAX_WORDS
+    MIN_WORDS = config["PASSAGE_MIN_WORDS"]
+    MAX_WORDS = config["PASSAGE_MAX_WORDS"]
+
+
+@lru_cache(maxsize=1)
+def load_vocabulary():
+    """
+    加载词汇等级表（只读取一次）
+
+    Returns:
+        dict: 单词 -> 等级（cet6 / postgrad）
+    """
+    vocabulary = {}
+    with open(VOCABULARY_PATH, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            word, level = line.rstrip("\n").split("\t")
+            vocabulary[word] = level
+    return vocabulary
+
+
+@lru_cache(maxsize=20000)
+def word_level(word):
+    """
+    查询单词的词汇等级，依次尝试原形和去掉常见后缀后的形式
+
+    Args:
+        word (str): 小写单词
+
+    Returns:
+        str: 等级，不在词表中时返回None
+    """
+    vocabulary = load_vocabulary()
+    if word in vocabulary:
+        return vocabulary[word]
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            stem = word[:-len(suffix)] + replacement
+            if stem in vocabulary:
+                return vocabulary[stem]
+    return None
+
+
+@lru_cache(maxsize=20000)
+def count_syllables(word):
+    """
+    估算单词的音节数（元音组计数，去掉词尾不发音的 e）
+
+    Args:
+        word (str): 小写单词
+
+    Returns:
+        int: 音节数，至少为1
+    """
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(count, 1)
+
+
+def analyze(content):
+    """
+    计算一篇阅读材料的统计数据
+    正文只分词一次，之后按不同单词（而不是逐个词）查词表和计算音节
+
+    Args:
+        content (str): 阅读材料全文
+
+    Returns:
+        dict: 统计数据（词数、句数、词汇覆盖率、可读性、题目数）
+    """
+    parsed = parse_passage(content)
+    body = "\n".join(parsed["paragraphs"])
+
+    counts = Counter(w.lower() for w in WORD_RE.findall(body))
+    word_count = sum(counts.values())
+    sentence_count = max(len(SENTENCE_RE.findall(body)), 1)
+
+    syllables = 0
+    levels = Counter()
+    for word, n in counts.items():
+        syllables += count_syllables(word) * n
+        level = word_level(word)
+        if level:
+            levels[level] += n
+
+    words = max(word_count, 1)
+    words_per_sentence = words / sentence_count
+    syllables_per_word = syllables / words
+    return {
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "unique_words": len(counts),
+        "cet6_words": levels["cet6"],
+        "postgrad_words": levels["postgrad"],
+        "cet6_ratio": round(levels["cet6"] / words, 4),
+        "postgrad_ratio": round(levels["postgrad"] / words, 4),
+        # Flesch Reading Ease：越高越容易（60–70 为普通难度，30–50 为大学水平）
+        "flesch_reading_ease": round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 2),
+        # Flesch-Kincaid 年级水平
+        "fk_grade": round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 2),
+        "question_count": len(parsed["questions"]),
+    }
+
+
+def check_spec(stats):
+    """
+    检查阅读材料是否符合提示词的要求
+
+    Args:
+        stats (dict): analyze() 的结果
+
+    Returns:
+        list: 不符合要求的说明，符合要求时为空列表
+    """
+    problems = []
+    if not MIN_WORDS <= stats["word_count"] <= MAX_WORDS:
+        problems.append(f"word count {stats['word_count']} outside {MIN_WORDS}-{MAX_WORDS}")
+    if not MIN_QUESTIONS <= stats["question_count"] <= MAX_QUESTIONS:
+        problems.append(f"{stats['question_count']} questions, expected {MIN_QUESTIONS}-{MAX_QUESTIONS}")
+    return problems
+
+
+def summary(since=None, until=None, by_topic=False):
+    """
+    汇总查询：只扫描 passage_stats 表，不再重新分析原文
+
+    Args:
+        since (str): 起始时间（含），格式 YYYY-MM-DD，默认为None
+        until (str): 结束时间（不含），格式 YYYY-MM-DD，默认为None
+        by_topic (bool): 是否按主题分组
+
+    Returns:
+        list: 每组一个字典（passages, avg_words, min_words, max_words, 覆盖率和可读性均值）
+    """
+    where, params = [], []
+    if since:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("created_at < ?")
+        params.append(until)
+    sql = (
+        "SELECT {group} COUNT(*), AVG(word_count), MIN(word_count), MAX(word_count), "
+        "AVG(cet6_ratio), AVG(postgrad_ratio), AVG(flesch_reading_ease), AVG(fk_grade), AVG(question_count) "
+        "FROM passage_stats {where} {group_by}"
+    ).format(
+        group="topic," if by_topic else "NULL,",
+        where=("WHERE " + " AND ".join(where)) if where else "",
+        group_by="GROUP BY topic ORDER BY COUNT(*) DESC" if by_topic else "",
+    )
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute(sql, params)
+    rows = c.fetchall()
+    conn.close()
+
+    keys = ("topic", "passages", "avg_words", "min_words", "max_words", "avg_cet6_ratio",
+            "avg_postgrad_ratio", "avg_flesch_reading_ease", "avg_fk_grade", "avg_questions")
+    result = []
+    for row in rows:
+        if not row[1]:
+            continue
+        item = dict(zip(keys, row))
+        for key in keys[5:]:
+            item[key] = round(item[key], 4)
+        item["avg_words"] = round(item["avg_words"], 1)
+        if not by_topic:
+            item.pop("topic")
+        result.append(item)
+    return result
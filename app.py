@@ -1,25 +1,95 @@
 # 导入必要的库
-from flask import Flask, render_template, request, jsonify, session  # Flask web框架相关模块
+from flask import Blueprint, Flask, current_app, g, render_template, request, jsonify, send_file, session  # Flask web框架相关模块
+import hashlib  # 计算阅读材料的ETag
+import io  # 发送后自动删除的临时文件
 import re  # 正则表达式模块，用于文本处理
 import os  # 操作系统接口模块
+import tempfile  # 合集下载使用的临时文件
 import uuid  # UUID生成模块，用于生成会话ID
 from datetime import datetime  # 日期时间处理模块
-from docx import Document  # python-docx库，用于创建Word文档
-from docx.shared import Pt  # Word文档字体大小设置
-from docx.oxml.ns import qn  # Word文档XML命名空间处理
-from agent import generate_daily_reading, get_state, save_state, is_sent, mark_sent, sha, init_db  # 代理模块相关函数
+import agent  # 代理模块
+import analytics  # 阅读材料统计
+import compression  # 响应压缩
+import export  # 阅读合集导出
+import grading  # 阅读理解答案批改
+import jobs  # 阅读生成任务队列
+import profiling  # 按需性能分析
+import sampler  # 选题采样与生成统计
+from config import load_config  # 运行配置
 from llm import generate_code  # 大语言模型生成代码的函数
+from functools import lru_cache  # 缓存已建立的段落索引
+from passage import clean_markdown, parse_passage  # 阅读材料结构化解析、Markdown清理
+from retrieval import BM25Index, select_paragraphs  # 段落检索
 import db  # 导入数据库模块
 
-# 创建Flask应用实例
-app = Flask(__name__)
-app.secret_key = 'english_learning_assistant_secret_key_2024'  # 设置会话密钥
+# 路由蓝图，由 create_app() 注册到应用实例上
+bp = Blueprint('main', __name__)
 
-# 字体配置
-FONT_PATH = r"D:\downLoad\Fast-Font-main\Fast-Font-main\Fast_Sans.ttf"  # 字体文件路径
-FONT_NAME = "Fast_Sans"  # 字体名称
-SAVE_FOLDER = r"E:\English_text"  # 保存文件的目录
-os.makedirs(SAVE_FOLDER, exist_ok=True)  # 创建保存目录，如果不存在的话
+# task 响应中阅读节选的长度（字符）
+PREVIEW_LENGTH = 600
+
+# 阅读材料保存后不再修改，客户端可以长期缓存
+PASSAGE_MAX_AGE = 365 * 24 * 3600
+
+# 客户端提交 task 时携带的幂等键请求头
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# 任务未完成时建议客户端的轮询间隔（秒）
+JOB_RETRY_AFTER = 2
+
+
+def create_app(config=None):
+    """
+    应用工厂：加载配置并创建Flask应用实例
+    配置只在这里解析一次，导入本模块不会产生任何副作用
+    
+    Args:
+        config (dict): 覆盖默认配置的键值，默认为None
+        
+    Returns:
+        Flask: 应用实例
+    """
+    cfg = dict(load_config())
+    if config:
+        cfg.update(config)
+
+    app = Flask(__name__)
+    app.config.update(cfg)
+    app.secret_key = cfg['SECRET_KEY']  # 设置会话密钥
+
+    # 将存储路径下发给数据库和代理模块
+    db.configure(cfg['DB_PATH'])
+    agent.configure(cfg)
+    profiling.configure(cfg)
+
+    app.register_blueprint(bp)
+    return app
+
+
+def init_storage():
+    """
+    初始化数据库并执行启动清理
+    每个工作进程启动时都会调用：迁移在写事务中执行，已执行的迁移会被跳过，
+    清理旧记录通过 db.claim_maintenance() 保证每天只由一个进程执行
+    """
+    db.init_db()
+
+    # 清理7天前的旧聊天记录
+    if db.claim_maintenance('clear_old_chat_history'):
+        db.clear_old_chat_history(7)
+
+    # 清理7天前已结束的生成任务
+    if db.claim_maintenance('clear_old_generation_jobs'):
+        db.clear_old_generation_jobs(7)
+
+
+def start_job_workers(app):
+    """
+    在当前进程中启动生成任务的工作线程（JOB_WORKERS 为 0 时不启动）
+    
+    Args:
+        app (Flask): 应用实例
+    """
+    jobs.start_workers(app, handle_task, app.config['JOB_WORKERS'])
 
 def get_session_id():
     """
@@ -33,6 +103,53 @@ def get_session_id():
     return session['session_id']
 
 
+@lru_cache(maxsize=64)
+def get_passage_index(passage_id):
+    """
+    获取阅读材料及其段落索引
+    阅读材料保存后不再修改，因此按ID缓存索引，每篇只建一次
+
+    Args:
+        passage_id (int): 阅读材料ID
+
+    Returns:
+        tuple: (结构化阅读材料, BM25Index)，如果材料不存在则返回 (None, None)
+    """
+    passage = db.get_passage(passage_id)
+    if not passage:
+        return None, None
+    return passage, BM25Index(passage["paragraphs"])
+
+
+def build_passage_context(passage_id, current_message, top_k=3):
+    """
+    为当前问题构建阅读材料上下文
+    只包含标题、与问题最相关的段落，以及问题涉及题目时的题目列表
+
+    Args:
+        passage_id (int): 阅读材料ID
+        current_message (str): 当前用户消息
+        top_k (int): 最多引用的段落数
+
+    Returns:
+        str: 阅读材料上下文，如果材料不存在则返回None
+    """
+    passage, index = get_passage_index(passage_id)
+    if not passage:
+        return None
+
+    paragraphs = passage["paragraphs"]
+    lines = [f"标题：{passage['title']}（全文共{len(paragraphs)}段）"]
+    for i in select_paragraphs(index, paragraphs, current_message, top_k=top_k):
+        lines.append(f"第{i + 1}段：{paragraphs[i]}")
+
+    # 问题涉及题目时附上题目列表
+    if passage["questions"] and re.search(r"question|题", current_message, re.IGNORECASE):
+        lines.append("题目：")
+        lines.extend(passage["questions"])
+    return "\n".join(lines)
+
+
 def build_context_prompt(session_id, current_message):
     """
     构建包含历史上下文的提示词
@@ -47,14 +164,19 @@ def build_context_prompt(session_id, current_message):
     # 获取聊天历史
     history = db.get_chat_history(session_id, limit=5)  # 获取最近5条记录
     
-    # 获取最新的任务内容（如果存在）
-    latest_task = db.get_latest_task_content(session_id)
-    
     # 构建上下文
     context_parts = []
     
-    if latest_task:
-        context_parts.append(f"最近生成的英语阅读材料：\n{latest_task[:500]}...")
+    # 优先使用结构化的阅读材料，只引用与问题相关的段落
+    passage_id = db.get_latest_passage_id(session_id)
+    passage_context = build_passage_context(passage_id, current_message) if passage_id else None
+    if passage_context:
+        context_parts.append(f"最近生成的英语阅读材料（节选相关段落）：\n{passage_context}")
+    else:
+        # 兼容没有结构化记录的旧任务内容
+        latest_task = db.get_latest_task_content(session_id)
+        if latest_task:
+            context_parts.append(f"最近生成的英语阅读材料：\n{latest_task[:500]}...")
     
     if history:
         context_parts.append("最近的对话历史：")
@@ -78,22 +200,7 @@ def build_context_prompt(session_id, current_message):
     return prompt
 
 
-def clean_markdown(text):
-    """
-    清理Markdown格式文本
-    
-    Args:
-        text (str): 输入的文本
-        
-    Returns:
-        str: 清理后的文本，移除了#和*符号
-    """
-    if not text:
-        return ""
-    # 移除 # 和 * 符号
-    cleaned = re.sub(r'[#*]', '', text)
-    return cleaned
-
+@profiling.timed('docx')
 def save_to_word_custom(text):
     """
     将文本保存为自定义格式的Word文档
@@ -104,9 +211,16 @@ def save_to_word_custom(text):
     Returns:
         str: 保存的文件路径
     """
+    # python-docx 导入较慢，只在第一次导出时导入
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    save_folder = current_app.config['SAVE_FOLDER']
+    font_name = current_app.config['FONT_NAME']
+
     # 生成文件名，格式为：English_Reading_YYYYMMDD.docx
-    filename = f"English_Reading_{datetime.today().strftime('%Y%m%d')}.docx"
-    path = os.path.join(SAVE_FOLDER, filename)
+    # 同一天的第二篇起为 English_Reading_YYYYMMDD_2.docx，不会覆盖之前的文件
+    path = export.reserve_path(save_folder, 'English_Reading', 'docx')
 
     # 创建新的Word文档
     doc = Document()
@@ -114,9 +228,9 @@ def save_to_word_custom(text):
     # 设置默认样式字体
     style = doc.styles['Normal']
     font = style.font
-    font.name = FONT_NAME
+    font.name = font_name
     # 为兼容性设置东亚字体（如果有混合内容）
-    font.element.rPr.rFonts.set(qn('w:eastAsia'), FONT_NAME)
+    font.element.rPr.rFonts.set(qn('w:eastAsia'), font_name)
     
     # 添加内容
     # 在保存前清理markdown格式
@@ -134,11 +248,11 @@ def save_to_word_custom(text):
     except PermissionError:
         # 如果文件被占用，生成带时间戳的备用文件名
         alt_name = f"English_Reading_{datetime.today().strftime('%Y%m%d_%H%M%S')}.docx"
-        alt_path = os.path.join(SAVE_FOLDER, alt_name)
+        alt_path = os.path.join(save_folder, alt_name)
         doc.save(alt_path)
         return alt_path
 
-@app.route('/')
+@bp.route('/')
 def index():
     """
     主页路由处理函数
@@ -149,7 +263,7 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/api/clear_history', methods=['POST'])
+@bp.route('/api/clear_history', methods=['POST'])
 def clear_history():
     """
     清除当前会话的聊天历史
@@ -159,23 +273,374 @@ def clear_history():
     """
     try:
         session_id = get_session_id()
-        # 清除当前会话的历史记录
-        import sqlite3
-        conn = sqlite3.connect(db.DB_PATH)
-        c = conn.cursor()
-        c.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
-        conn.commit()
-        conn.close()
+        # 清除当前会话的历史记录，阅读材料不再作为该会话的上下文
+        db.clear_session_history(session_id)
         
         return jsonify({'success': True, 'message': 'Chat history cleared successfully.'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
-@app.route('/api/chat', methods=['POST'])
+def handle_task(session_id, message):
+    """
+    处理 task 请求：生成英语阅读任务并保存
+    由生成任务的工作线程在应用上下文中调用（保存Word文档时读取配置）
+    
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        
+    Returns:
+        dict: 响应数据
+    """
+    # 生成阅读任务：优先使用调度器预生成的阅读，否则调用LLM生成（含去重和保存学习状态）
+    # Word文档由本模块的 save_to_word_custom 按自定义字体保存
+    try:
+        content = agent.get_reading()
+    except Exception as e:
+        return {'response': f'Service error: {str(e)}'}
+    
+    # 如果成功生成内容
+    if content:
+        # 清理markdown格式
+        cleaned_content = clean_markdown(content)
+        # 保存为Word文档
+        file_path = save_to_word_custom(cleaned_content)
+        
+        # 构建响应消息：只包含节选，完整内容由客户端按需从 /api/passages/<id> 获取
+        response_msg = (
+            f"Today's English reading is ready!\nSaved as: {os.path.basename(file_path)}\n\n"
+            + cleaned_content[:PREVIEW_LENGTH] + "..."
+        )
+        
+        # 保存聊天历史（包含完整内容）
+        db.save_chat_history(session_id, message, cleaned_content, 'task')
+        # 解析一次并结构化保存，供后续对话按段落检索
+        passage_id = db.save_passage(session_id, cleaned_content, parse_passage(cleaned_content))
+        
+        # 返回响应
+        return {
+            'response': response_msg,
+            'passage_id': passage_id,
+        }
+    else:
+        error_msg = "Failed to generate content. Please try again."
+        db.save_chat_history(session_id, message, error_msg, 'task')
+        return {'response': error_msg}
+
+
+def submit_task(session_id, message, idempotency_key=None):
+    """
+    提交 task 请求的生成任务，立即返回任务状态
+    
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        idempotency_key (str): 客户端提供的幂等键，默认为None
+        
+    Returns:
+        tuple: (响应数据, HTTP状态码)；任务未完成时为 202
+    """
+    job_id = jobs.submit(session_id, message, idempotency_key)
+    payload = jobs.get_status(job_id, session_id)
+    return payload, 200 if payload['status'] in ('done', 'failed') else 202
+
+
+def finish_chat(session_id, message, response):
+    """
+    处理LLM的对话回复：清理格式并保存聊天历史
+    
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        response (str): LLM返回的内容，失败时为None
+        
+    Returns:
+        dict: 响应数据
+    """
+    if response:
+        # 清理响应中的markdown格式
+        cleaned_response = clean_markdown(response)
+        
+        # 保存聊天历史
+        db.save_chat_history(session_id, message, cleaned_response, 'chat')
+        
+        return {'response': cleaned_response}
+    else:
+        error_msg = "Sorry, I couldn't generate a response."
+        db.save_chat_history(session_id, message, error_msg, 'chat')
+        return {'response': error_msg}
+
+
+def chat_failed(session_id, message, error):
+    """
+    记录对话请求的服务错误
+    
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        error (Exception): 异常对象
+        
+    Returns:
+        dict: 响应数据
+    """
+    error_msg = f'Service error: {str(error)}'
+    db.save_chat_history(session_id, message, error_msg, 'chat')
+    return {'response': error_msg}
+
+
+@bp.route('/api/analytics/summary')
+def analytics_summary():
+    """
+    阅读材料统计汇总
+    查询参数：since / until（YYYY-MM-DD）、by_topic（1 表示按主题分组）
+    
+    Returns:
+        json: 汇总结果列表
+    """
+    return jsonify(analytics.summary(
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        by_topic=request.args.get('by_topic') == '1',
+    ))
+
+
+@bp.route('/api/analytics/generation')
+def generation_summary():
+    """
+    生成重试统计：LLM调用次数、每篇成功文章平均调用次数、重复和不合格次数
+    
+    Returns:
+        json: 统计结果
+    """
+    return jsonify(sampler.generation_summary())
+
+
+@bp.before_app_request
+def start_profile():
+    """
+    按抽样比例或管理员请求头决定是否分析本次请求
+    """
+    g.profile = profiling.start_request(
+        request.method, request.path, request.headers.get(profiling.TOKEN_HEADER)
+    )
+
+
+@bp.after_app_request
+def finish_profile(response):
+    """
+    结束本次请求的性能分析并写入分析文件
+    
+    Returns:
+        Response: 原响应
+    """
+    if g.get('profile'):
+        profiling.finish_request(g.pop('profile'), response.status_code)
+    return response
+
+
+@bp.teardown_app_request
+def abort_profile(exc):
+    """
+    请求因异常中断（after_request 未执行）时同样结束分析
+    """
+    if g.get('profile'):
+        profiling.finish_request(g.pop('profile'), 500)
+
+
+@bp.route('/api/profiles/slowest')
+def slowest_profiles():
+    """
+    列出最近被分析的请求中最慢的若干个，以及各自最耗时的调用栈
+    需要在请求头 X-Profile-Token 中提供 PROFILE_ADMIN_TOKEN，否则返回404
+    查询参数：limit（默认20）
+    
+    Returns:
+        json: {"profiles": [摘要]}
+    """
+    if not profiling.is_admin(request.headers.get(profiling.TOKEN_HEADER)):
+        return jsonify({'success': False, 'message': 'Not found.'}), 404
+    return jsonify({'profiles': profiling.slowest(request.args.get('limit', 20, type=int))})
+
+
+@bp.after_app_request
+def compress_response(response):
+    """
+    按 Accept-Encoding 压缩较大的JSON/文本响应
+    
+    Returns:
+        Response: 处理后的响应
+    """
+    return compression.compress_response(response, request.headers.get('Accept-Encoding'))
+
+
+@bp.route('/api/passages/<int:passage_id>')
+def passage_detail(passage_id):
+    """
+    获取阅读材料全文（task 响应只返回ID和节选）
+    内容不可变：带强 ETag 和长期缓存头，重复请求返回 304
+    
+    Args:
+        passage_id (int): 阅读材料ID
+        
+    Returns:
+        json: {"id", "title", "content"}
+    """
+    passage = db.get_passage_content(passage_id)
+    if not passage:
+        return jsonify({'success': False, 'message': 'Passage not found.'}), 404
+
+    response = jsonify({'id': passage['id'], 'title': passage['title'], 'content': passage['content']})
+    response.set_etag(hashlib.sha256(passage['content'].encode('utf-8')).hexdigest()[:32])
+    response.cache_control.public = True
+    response.cache_control.max_age = PASSAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+@bp.route('/api/passages/<int:passage_id>/grade', methods=['POST'])
+def grade_passage(passage_id):
+    """
+    批改一篇阅读材料全部题目的答案（一次LLM调用，相同答案直接返回缓存结果）
+    请求体：{"answers": [第1题答案, 第2题答案, ...]}，数量与题目数一致，未作答的题目传空字符串
+    
+    Args:
+        passage_id (int): 阅读材料ID
+        
+    Returns:
+        json: {"passage_id", "score", "total", "grades": [{"question", "score", "correct", "expected", "feedback"}], "cached"}
+    """
+    passage = db.get_passage(passage_id)
+    if not passage:
+        return jsonify({'success': False, 'message': 'Passage not found.'}), 404
+
+    if not passage['questions']:
+        return jsonify({'success': False, 'message': 'This passage has no questions.'}), 400
+
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if (not isinstance(answers, list) or len(answers) != len(passage['questions'])
+            or not all(a is None or isinstance(a, str) for a in answers)):
+        return jsonify({
+            'success': False,
+            'message': f"Expected 'answers' to be a list of {len(passage['questions'])} strings.",
+        }), 400
+
+    try:
+        result = grading.grade_answers(get_session_id(), passage, answers)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Service error: {str(e)}'}), 502
+    if not result:
+        return jsonify({'success': False, 'message': 'Could not grade the answers. Please try again.'}), 502
+    return jsonify(result)
+
+
+@bp.route('/api/progress')
+def progress():
+    """
+    当前会话最近的答案提交记录
+    查询参数：limit（默认20）
+    
+    Returns:
+        json: {"submissions": [{"passage_id", "title", "score", "total", "timestamp"}]}
+    """
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'submissions': db.get_answer_submissions(get_session_id(), limit)})
+
+
+@bp.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    """
+    查询生成任务的状态（只能查询当前会话提交的任务）
+    
+    Args:
+        job_id (int): 任务ID
+        
+    Returns:
+        json: {"job_id", "status"}，status 为 done 时包含 task 的响应数据（response / passage_id）
+    """
+    payload = jobs.get_status(job_id, get_session_id())
+    if not payload:
+        return jsonify({'success': False, 'message': 'Job not found.'}), 404
+
+    response = jsonify(payload)
+    response.cache_control.no_store = True
+    if payload['status'] in ('queued', 'running'):
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+    return response
+
+
+@bp.route('/api/export')
+def export_anthology():
+    """
+    下载阅读合集（Word 或 Markdown，开头带目录）
+    查询参数：since / until（YYYY-MM-DD）、limit（最多篇数）、format（docx 或 md，默认为 docx）
+    
+    Returns:
+        file: 合集文件；参数无效或没有符合条件的阅读时返回JSON错误
+    """
+    fmt = request.args.get('format', 'docx')
+    if fmt not in export.FORMATS:
+        return jsonify({'success': False, 'message': f'Unsupported format: {fmt}'}), 400
+    limit = request.args.get('limit', type=int)
+
+    # 逐篇写入临时文件，发送完成后删除；保存目录中的合集文件只由命令行导出生成
+    fd, tmp_path = tempfile.mkstemp(prefix='anthology_', suffix=f'.{fmt}')
+    os.close(fd)
+    try:
+        path, count = export.export_anthology(
+            current_app.config['SAVE_FOLDER'],
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=limit,
+            fmt=fmt,
+            font_name=current_app.config['FONT_NAME'],
+            output=tmp_path,
+        )
+    except Exception:
+        remove_file(tmp_path)
+        raise
+    if not path:
+        remove_file(tmp_path)
+        return jsonify({'success': False, 'message': 'No readings in the selected range.'}), 404
+
+    download_name = f"English_Reading_Anthology_{datetime.today().strftime('%Y%m%d')}.{fmt}"
+    # send_file 的响应不会执行 call_on_close 回调，改为在文件对象关闭（发送完成或连接断开）时删除
+    return send_file(TemporaryDownload(tmp_path), as_attachment=True, download_name=download_name)
+
+
+class TemporaryDownload(io.FileIO):
+    """
+    只读打开的临时文件，关闭时删除
+    """
+
+    def __init__(self, path):
+        super().__init__(path, 'r')
+        self.path = path
+
+    def close(self):
+        super().close()
+        remove_file(self.path)
+
+
+def remove_file(path):
+    """
+    删除文件（文件已不存在时忽略）
+    
+    Args:
+        path (str): 文件路径
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@bp.route('/api/chat', methods=['POST'])
 def chat():
     """
     聊天API路由处理函数
     处理用户的聊天请求，包括生成英语阅读任务和普通对话
+    task 请求提交为后台生成任务，返回任务ID，结果通过 /api/jobs/<id> 获取
+    异步版本见 asgi.py，两者共用下面的处理函数
     
     Returns:
         json: 包含响应内容的JSON对象
@@ -191,126 +656,34 @@ def chat():
     if not message:
         return jsonify({'response': ''})
 
-    # 如果用户输入'task'，生成英语阅读任务
+    # 如果用户输入'task'，提交英语阅读的生成任务
     if message.lower() == 'task':
-        # 生成阅读任务
-        # 复用agent.py的逻辑但需要捕获输出
-        # agent.py的generate_daily_reading返回(content, file_path)
-        # 但它使用agent.py的save_to_word保存文件
-        # 我们想要使用自定义的save_to_word逻辑
-        
-        # 所以我们应该调用LLM生成部分，但自己处理保存
-        # 但agent.py中的generate_daily_reading包含了所有内容包括保存
-        # 为了使用自定义字体，我们复制逻辑而不是修改agent.py
-        
-        # 获取当前状态
-        topic, step = get_state()
-        
-        # 构建提示词
-        prompt = f"""
-You are an advanced English learning assistant.
-
-Task:
-Generate a high-quality English reading passage suitable for CET-6 level learners.
-
-Requirements:
-1. Topic should be ONE of the following:
-   - Finance & Economics
-   - Academic Research
-   - Science & Technology
-   - Famous Speeches or Intellectual Essays
-2. Length: 600–900 words
-3. Style: formal, logical, well-structured
-4. After the passage, provide 5–8 English comprehension questions
-5. DO NOT provide answers
-6. Content must be original and not repeated
-
-Output format:
-Title
----
-Reading Passage
----
-Questions
-"""
-        # 重试逻辑，最多尝试5次
-        content = None
-        for _ in range(5):
-            try:
-                # 调用LLM生成内容
-                result = generate_code(prompt)
-            except Exception as e:
-                return jsonify({'response': f'Service error: {str(e)}'})
-            if not result:
-                continue
-            # 计算内容哈希值
-            h = sha(result)
-            # 检查是否已经发送过相同内容
-            if is_sent(h):
-                continue
-            # 标记为已发送
-            mark_sent(h)
-            # 保存状态
-            save_state(topic, step + 1, result)
-            content = result
-            break
-        
-        # 如果成功生成内容
-        if content:
-            # 清理markdown格式
-            cleaned_content = clean_markdown(content)
-            # 保存为Word文档
-            file_path = save_to_word_custom(cleaned_content)
-            
-            # 构建响应消息
-            response_msg = f"Today's English reading is ready!\nSaved to: {file_path}\n\n" + cleaned_content[:600] + "..."
-            
-            # 保存聊天历史（包含完整内容）
-            db.save_chat_history(session_id, message, cleaned_content, 'task')
-            
-            # 返回响应
-            return jsonify({
-                'response': response_msg,
-                'full_content': cleaned_content,
-                'file_path': file_path
-            })
-        else:
-            error_msg = "Failed to generate content. Please try again."
-            db.save_chat_history(session_id, message, error_msg, 'task')
-            return jsonify({'response': error_msg})
+        payload, status = submit_task(session_id, message, request.headers.get(IDEMPOTENCY_HEADER))
+        return jsonify(payload), status
 
-    else:
-        # 处理普通聊天消息
-        try:
-            # 构建包含上下文的提示词
-            context_prompt = build_context_prompt(session_id, message)
-            
-            # 调用LLM生成响应
-            response = generate_code(context_prompt)
-        except Exception as e:
-            error_msg = f'Service error: {str(e)}'
-            db.save_chat_history(session_id, message, error_msg, 'chat')
-            return jsonify({'response': error_msg})
+    # 处理普通聊天消息
+    try:
+        # 构建包含上下文的提示词
+        context_prompt = build_context_prompt(session_id, message)
         
-        if response:
-            # 清理响应中的markdown格式
-            cleaned_response = clean_markdown(response)
-            
-            # 保存聊天历史
-            db.save_chat_history(session_id, message, cleaned_response, 'chat')
-            
-            return jsonify({'response': cleaned_response})
-        else:
-            error_msg = "Sorry, I couldn't generate a response."
-            db.save_chat_history(session_id, message, error_msg, 'chat')
-            return jsonify({'response': error_msg})
+        # 调用LLM生成响应
+        response = generate_code(context_prompt)
+    except Exception as e:
+        return jsonify(chat_failed(session_id, message, e))
+    
+    return jsonify(finish_chat(session_id, message, response))
 
 if __name__ == '__main__':
-    # 初始化数据库
-    init_db()
-    db.init_db()  # 确保新的聊天历史表也被创建
-    
-    # 清理7天前的旧聊天记录
-    db.clear_old_chat_history(7)
+    # 开发服务器入口；生产环境请使用 serve.py（waitress）或 gunicorn -c gunicorn.conf.py
+    # 创建应用（加载配置）
+    app = create_app()
+
+    # 初始化数据库并清理旧记录
+    init_storage()
+
+    # 调试模式下重载器的父进程只负责监视文件，工作线程只在实际运行应用的子进程中启动
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_workers(app)
     
     # 启动Flask应用
     # host='0.0.0.0' 允许外部访问
@@ -0,0 +1,216 @@
+# asgi.py - ASGI 入口（异步对话路径）
+# 用法：uvicorn asgi:application --host 0.0.0.0 --port 80
+#
+# POST /api/chat 的普通对话在事件循环中异步等待LLM，等待期间不占用线程，
+# 一个进程可以同时挂起数百个生成请求；数据库操作放在 adb 的小线程池中执行。
+# task 请求与同步路径相同，提交为后台生成任务（jobs.py）后立即返回任务ID。
+# 其余路由（首页、清除历史等）原样交给 Flask 应用处理。
+
+import json  # JSON编解码
+import uuid  # 生成会话ID
+from http.cookies import SimpleCookie  # 解析Cookie请求头
+
+from asgiref.wsgi import WsgiToAsgi  # 将 Flask（WSGI）应用挂到 ASGI 上
+from itsdangerous import BadSignature  # 会话Cookie签名校验失败
+
+import adb  # 数据库异步封装
+import compression  # 响应压缩
+import profiling  # 按需性能分析
+from app import (IDEMPOTENCY_HEADER, build_context_prompt, chat_failed, create_app, finish_chat, init_storage,
+                 start_job_workers, submit_task)
+from llm import aclose, agenerate_code
+
+# 创建 Flask 应用并初始化数据库（与 wsgi.py 相同，可被多个工作进程同时执行）
+flask_app = create_app()
+init_storage()
+start_job_workers(flask_app)
+wsgi_application = WsgiToAsgi(flask_app)
+
+# 与 Flask 共用同一个会话Cookie：两条路径看到的是同一个 session_id
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+_session_cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+_session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+
+
+def load_session(headers):
+    """
+    从请求头中读取并校验 Flask 会话Cookie
+
+    Args:
+        headers (list): ASGI 请求头 [(name, value)]
+
+    Returns:
+        dict: 会话数据，Cookie 不存在或签名无效时返回空字典
+    """
+    for name, value in headers:
+        if name != b'cookie':
+            continue
+        cookie = SimpleCookie()
+        cookie.load(value.decode('latin-1'))
+        if _session_cookie_name in cookie:
+            try:
+                return dict(_session_serializer.loads(cookie[_session_cookie_name].value, max_age=_session_max_age))
+            except BadSignature:
+                return {}
+    return {}
+
+
+def session_cookie_header(data):
+    """
+    生成写回会话Cookie的 Set-Cookie 响应头
+
+    Args:
+        data (dict): 会话数据
+
+    Returns:
+        tuple: (b'set-cookie', 值)
+    """
+    value = _session_serializer.dumps(data)
+    return (b'set-cookie', f'{_session_cookie_name}={value}; HttpOnly; Path=/'.encode('latin-1'))
+
+
+async def read_body(receive):
+    """
+    读取完整的请求体
+
+    Args:
+        receive (callable): ASGI receive
+
+    Returns:
+        bytes: 请求体
+    """
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+def get_header(headers, name):
+    """
+    读取请求头（ASGI 请求头名称均为小写）
+
+    Args:
+        headers (list): ASGI 请求头 [(name, value)]
+        name (bytes): 小写的请求头名称
+
+    Returns:
+        str: 请求头的值，不存在时返回None
+    """
+    for key, value in headers:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def send_json(send, data, status=200, extra_headers=(), accept_encoding=None):
+    """
+    发送JSON响应，较大的响应体按 Accept-Encoding 压缩（规则与 Flask 路由相同）
+
+    Args:
+        send (callable): ASGI send
+        data (dict): 响应数据
+        status (int): HTTP 状态码
+        extra_headers (tuple): 额外的响应头
+        accept_encoding (str): 请求头 Accept-Encoding 的值
+    """
+    body = json.dumps(data).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+    encoding = compression.choose_encoding(accept_encoding)
+    if encoding and compression.should_compress(body, 'application/json'):
+        body = compression.compress(body, encoding)
+        headers.append((b'content-encoding', encoding.encode()))
+    headers += [(b'content-length', str(len(body)).encode()), *extra_headers]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def chat(scope, receive, send):
+    """
+    异步版本的 /api/chat，逻辑与 app.chat 相同
+    """
+    try:
+        data = json.loads(await read_body(receive) or b'null')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        await send_json(send, {'response': 'Invalid JSON body.'}, status=400)
+        return
+    message = str(data.get('message', '')).strip()
+    # 异步路径上多个请求交替执行，cProfile 无法区分，只记录各阶段耗时
+    profile = profiling.start_request(
+        'POST', scope['path'], get_header(scope['headers'], profiling.TOKEN_HEADER.lower().encode()),
+        use_cprofile=False,
+    )
+    status = 500
+    try:
+        await respond_chat(scope, send, message)
+        status = 200
+    finally:
+        if profile:
+            profiling.finish_request(profile, status)
+
+
+async def respond_chat(scope, send, message):
+    """
+    处理一条对话消息：获取会话、生成回复并发送响应
+    """
+    # 获取或创建会话ID
+    session_data = load_session(scope['headers'])
+    extra_headers = ()
+    if 'session_id' not in session_data:
+        session_data['session_id'] = str(uuid.uuid4())
+        extra_headers = (session_cookie_header(session_data),)
+    session_id = session_data['session_id']
+
+    # 如果消息为空，返回空响应
+    if not message:
+        await send_json(send, {'response': ''}, extra_headers=extra_headers)
+        return
+
+    status = 200
+    if message.lower() == 'task':
+        # 只写入任务队列，生成由工作线程执行，结果通过 GET /api/jobs/<id>（Flask 路由）获取
+        idempotency_key = get_header(scope['headers'], IDEMPOTENCY_HEADER.lower().encode())
+        payload, status = await adb.run(submit_task, session_id, message, idempotency_key)
+    else:
+        try:
+            # 构建上下文需要查询数据库，在数据库线程池中执行
+            context_prompt = await adb.run(build_context_prompt, session_id, message)
+            # 等待LLM期间不占用任何线程
+            response = await agenerate_code(context_prompt)
+        except Exception as e:
+            payload = await adb.run(chat_failed, session_id, message, e)
+        else:
+            payload = await adb.run(finish_chat, session_id, message, response)
+
+    await send_json(send, payload, status=status, extra_headers=extra_headers,
+                    accept_encoding=get_header(scope['headers'], b'accept-encoding'))
+
+
+async def lifespan(receive, send):
+    """
+    处理 ASGI lifespan 事件：关闭时释放HTTP客户端和线程池
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aclose()
+            adb.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """
+    ASGI 应用入口
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+        await chat(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
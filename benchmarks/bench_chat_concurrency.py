@@ -0,0 +1,141 @@
+# bench_chat_concurrency.py - 同步 / 异步对话路径的并发基准测试
+# 分别启动 waitress（同步，线程池）和 uvicorn（异步）服务器，
+# LLM 使用本地模拟服务（固定延迟），并发发送普通对话请求，比较吞吐量、延迟和服务器线程数
+#
+# 用法：
+#   python benchmarks/bench_chat_concurrency.py --concurrency 200 --requests 600 --delay 1.0
+
+import argparse  # 命令行参数解析
+import os  # 操作系统接口模块
+import statistics  # 统计
+import subprocess  # 启动服务器子进程
+import sys  # 解释器路径
+import tempfile  # 临时数据库目录
+import threading  # 后台运行模拟LLM
+import time  # 计时
+from concurrent.futures import ThreadPoolExecutor  # 并发客户端
+
+import requests  # HTTP客户端
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import make_server  # noqa: E402
+
+# 仓库根目录
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def server_command(mode, port, threads):
+    """
+    返回启动指定模式服务器的命令
+
+    Args:
+        mode (str): sync 或 async
+        port (int): 监听端口
+        threads (int): 同步服务器的线程数
+
+    Returns:
+        tuple: (命令列表, 额外环境变量)
+    """
+    if mode == "sync":
+        return [sys.executable, "serve.py"], {"WEB_PORT": str(port), "WEB_THREADS": str(threads)}
+    return ([sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port),
+             "--log-level", "warning", "--backlog", "4096"], {})
+
+
+def wait_ready(url, timeout=30):
+    """
+    等待服务器可以响应请求
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def thread_count(pid):
+    """
+    读取进程当前的线程数（仅 Linux），无法读取时返回 None
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def run_mode(mode, args, llm_url):
+    """
+    启动一个服务器并压测，返回结果字典
+    """
+    port = args.port
+    tmp = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    cmd, extra_env = server_command(mode, port, args.threads)
+    env = dict(os.environ, SAVE_FOLDER=tmp, DB_PATH=os.path.join(tmp, "bench.db"),
+               DEEPSEEK_API_URL=llm_url, DEEPSEEK_API_KEY="bench", **extra_env)
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base + "/")
+        local = threading.local()
+        peak_threads = [0]
+
+        def one(i):
+            # 每个客户端线程使用独立的会话（独立的 session_id）
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            start = time.perf_counter()
+            resp = local.session.post(base + "/api/chat", json={"message": f"question {i}"}, timeout=600)
+            resp.raise_for_status()
+            peak_threads[0] = max(peak_threads[0], thread_count(proc.pid) or 0)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            latencies = sorted(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {
+        "mode": mode,
+        "throughput": args.requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+        "threads": peak_threads[0] or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync (waitress) and async (uvicorn) chat paths")
+    parser.add_argument("--concurrency", type=int, default=200, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=600, help="total chat requests per mode")
+    parser.add_argument("--delay", type=float, default=1.0, help="simulated LLM latency in seconds")
+    parser.add_argument("--threads", type=int, default=64, help="waitress threads for the sync path")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--llm-port", type=int, default=8900)
+    parser.add_argument("--modes", default="sync,async")
+    args = parser.parse_args()
+
+    llm = make_server(args.llm_port, args.delay)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{args.llm_port}/v1/chat/completions"
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, LLM delay {args.delay}s")
+    print(f"{'mode':6s} {'req/s':>8s} {'p50':>8s} {'p95':>8s} {'max':>8s} {'threads':>8s}")
+    for mode in args.modes.split(","):
+        r = run_mode(mode, args, llm_url)
+        print(f"{r['mode']:6s} {r['throughput']:8.1f} {r['p50']:7.2f}s {r['p95']:7.2f}s {r['max']:7.2f}s {str(r['threads']):>8s}")
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_startup.py - 冷启动基准测试
+# 在独立子进程中测量Web应用和命令行的冷启动耗时（导入 + 配置加载）
+#
+# 用法：
+#   python benchmarks/bench_startup.py            # 每个场景运行10次
+#   python benchmarks/bench_startup.py -n 30 --importtime   # 额外输出最慢的导入模块
+
+import argparse  # 命令行参数解析
+import os  # 操作系统接口模块
+import statistics  # 统计中位数等
+import subprocess  # 启动子进程
+import sys  # 解释器路径
+import tempfile  # 临时目录，避免写入真实的保存目录
+import time  # 计时
+
+# 仓库根目录
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 测量场景：名称 -> 子进程中执行的代码
+SCENARIOS = {
+    "web (import app + create_app)": "import app; app.create_app()",
+    "cli (import agent + load_config)": "import agent, config; agent.configure(config.load_config())",
+}
+
+
+def run_once(code, env):
+    """
+    在新的解释器进程中执行一次代码，返回耗时（秒）
+
+    Args:
+        code (str): 要执行的代码
+        env (dict): 子进程环境变量
+
+    Returns:
+        float: 进程从启动到退出的耗时
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(code, env, top=10):
+    """
+    使用 -X importtime 找出最慢的导入模块
+
+    Args:
+        code (str): 要执行的代码
+        env (dict): 子进程环境变量
+        top (int): 返回的模块数
+
+    Returns:
+        list: [(累计耗时微秒, 模块名)]
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # 格式："import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the web app and the CLI")
+    parser.add_argument("-n", type=int, default=10, help="runs per scenario")
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, SAVE_FOLDER=tmp, DB_PATH=os.path.join(tmp, "bench.db"))
+
+    # 基线：空解释器的启动耗时
+    baseline = [run_once("pass", env) for _ in range(args.n)]
+    print(f"{'python -c pass':40s} median {statistics.median(baseline) * 1000:7.1f} ms")
+
+    for name, code in SCENARIOS.items():
+        times = [run_once(code, env) for _ in range(args.n)]
+        print(f"{name:40s} median {statistics.median(times) * 1000:7.1f} ms"
+              f"  min {min(times) * 1000:7.1f} ms  max {max(times) * 1000:7.1f} ms")
+        if args.importtime:
+            for cumulative_us, module in slowest_imports(code, env):
+                print(f"    {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# fake_llm.py - 模拟 DeepSeek API 的本地服务
+# 每个请求等待固定时间后返回一段固定文本，用于在不消耗API额度的情况下压测服务器；
+# make_recorded_server() 则返回从聊天记录中导出的真实回复（用于 replay.py 回放）
+#
+# 用法：
+#   python benchmarks/fake_llm.py --port 8900 --delay 1.0
+#   DEEPSEEK_API_URL=http://127.0.0.1:8900/v1/chat/completions DEEPSEEK_API_KEY=bench python serve.py
+
+import argparse  # 命令行参数解析
+import collections  # 录制文章的队列
+import json  # JSON编解码
+import threading  # 保护录制文章队列
+import time  # 模拟生成耗时
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 多线程HTTP服务器
+
+# 固定的回复文本
+DEFAULT_REPLY = "This is a simulated reply from the benchmark LLM stand-in."
+
+# 生成阅读的提示词（prompt.reading_prompt）中的固定文字，用于区分生成请求和对话请求
+GENERATION_MARKER = "Generate a high-quality English reading passage"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """
+    兼容 OpenAI / DeepSeek chat completions 格式的请求处理器
+    """
+
+    # 由 make_server() 设置
+    delay = 1.0
+    reply = DEFAULT_REPLY
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        time.sleep(self.delay)
+        body = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": self.reply}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 压测时不输出访问日志
+        pass
+
+
+def make_server(port, delay, reply=DEFAULT_REPLY):
+    """
+    创建模拟服务
+
+    Args:
+        port (int): 监听端口
+        delay (float): 每个请求的模拟耗时（秒）
+        reply (str): 返回的文本
+
+    Returns:
+        ThreadingHTTPServer: 服务器实例
+    """
+    handler = type("Handler", (FakeLLMHandler,), {"delay": delay, "reply": reply})
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class RecordedLLMHandler(BaseHTTPRequestHandler):
+    """
+    回放录制的回复：生成阅读的请求按顺序返回录制的文章，
+    对话请求返回提示词中最后出现的录制消息所对应的回复
+    """
+
+    # 由 make_recorded_server() 设置
+    delay = 1.0
+    generation_delay = 5.0
+    replies = {}
+    passages = None
+    lock = None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            prompt = json.loads(self.rfile.read(length))["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            prompt = ""
+
+        if GENERATION_MARKER in prompt:
+            time.sleep(self.generation_delay)
+            with self.lock:
+                reply = self.passages.popleft() if self.passages else DEFAULT_REPLY
+        else:
+            time.sleep(self.delay)
+            reply = self.match(prompt)
+
+        body = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": reply}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def match(self, prompt):
+        """
+        找出提示词中结束位置最靠后的录制消息（当前问题在提示词末尾，历史消息在前面）
+        """
+        best, best_end = None, -1
+        for message in self.replies:
+            end = prompt.rfind(message)
+            if end >= 0 and (end + len(message), len(message)) > (best_end, len(best or "")):
+                best, best_end = message, end + len(message)
+        return self.replies[best] if best is not None else DEFAULT_REPLY
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_recorded_server(port, delay, generation_delay, replies, passages):
+    """
+    创建回放录制回复的模拟服务（见 replay.py）
+
+    Args:
+        port (int): 监听端口
+        delay (float): 对话请求的模拟耗时（秒）
+        generation_delay (float): 生成阅读请求的模拟耗时（秒）
+        replies (dict): 用户消息 -> 录制的回复
+        passages (list): 录制的文章，按顺序返回
+
+    Returns:
+        ThreadingHTTPServer: 服务器实例
+    """
+    handler = type("Handler", (RecordedLLMHandler,), {
+        "delay": delay,
+        "generation_delay": generation_delay,
+        "replies": dict(replies),
+        "passages": collections.deque(passages),
+        "lock": threading.Lock(),
+    })
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the DeepSeek chat completions API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds to wait before replying")
+    args = parser.parse_args()
+    make_server(args.port, args.delay).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
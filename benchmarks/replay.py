@@ -0,0 +1,475 @@
+# replay.py - 基于 chat_history 的流量录制与回放
+# 1. export：从数据库导出匿名化的会话（会话ID重新编号，对话文字按单词替换，生成的文章原样保留）
+# 2. run：启动指定版本的服务器（临时数据库）和回放录制回复的模拟LLM，
+#    按原始时间间隔（可加速、可压缩长时间空闲）重放每个会话，记录延迟和数据库增长
+# 3. compare：对比两次 run 的结果
+#
+# 用法：
+#   python benchmarks/replay.py export --db E:\English_text\english_learning.db --out trace.jsonl
+#   git worktree add ../baseline main
+#   python benchmarks/replay.py run --trace trace.jsonl --build ../baseline --out base.json --speed 10
+#   python benchmarks/replay.py run --trace trace.jsonl --out new.json --speed 10
+#   python benchmarks/replay.py compare base.json new.json
+#
+# 没有 serve.py 的旧版本自动改用 app.py 中的 Flask 应用（--server app），
+# 也可以用 --server-cmd 指定任意启动命令，例如 --server-cmd "{python} my_server.py --port {port}"。
+# 服务器的输出写入临时目录下的 server.log，启动失败时会打印该路径。
+
+import argparse  # 命令行参数解析
+import hashlib  # 匿名化时的确定性替换
+import json  # 录制文件和结果
+import os  # 操作系统接口模块
+import re  # 分词
+import shlex  # 解析 --server-cmd
+import sqlite3  # 读取聊天记录和统计数据库增长
+import subprocess  # 启动服务器子进程
+import sys  # 解释器路径
+import tempfile  # 临时数据库目录
+import threading  # 后台运行模拟LLM
+import time  # 计时
+from collections import defaultdict  # 按会话分组
+from concurrent.futures import ThreadPoolExecutor  # 每个会话一个客户端线程
+from datetime import datetime  # 解析时间戳
+
+import requests  # HTTP客户端
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_chat_concurrency import server_command  # noqa: E402
+from fake_llm import make_recorded_server  # noqa: E402
+
+# 仓库根目录
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 匿名化时替换英文单词所用的词表
+VOCABULARY_PATH = os.path.join(ROOT, "data", "vocabulary.tsv")
+# 替换中文字符所用的字符
+CJK_POOL = "的一是在不了有和人这中大为上个我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+
+WORD_RE = re.compile(r"[A-Za-z]+")
+CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+# 段落引用（第五段、paragraph 2、最后一段）保留原样，使检索路径与原始请求一致
+KEEP_RE = re.compile(
+    r"第\s*[\d一二三四五六七八九十]+\s*(?:段|自然段)|最后一段|(?:paragraph|para\.?)\s*\d+|last\s+paragraph",
+    re.IGNORECASE,
+)
+# 指令类消息原样保留
+COMMANDS = {"task"}
+# --server app：在被测版本目录中直接运行 app.py 里的 Flask 应用
+# 兼容有应用工厂（create_app / init_storage / start_job_workers）和只有模块级 app 的旧版本
+# （旧版本的保存目录、数据库路径和 API 地址写死在模块中，这里改为指向回放用的临时目录和模拟LLM）；
+# 不使用 app.py 自身的 __main__（固定 80 端口并开启调试重载）
+APP_LAUNCHER = """
+import os
+import sys
+import app as module
+if hasattr(module, "create_app"):
+    application = module.create_app()
+    if hasattr(module, "init_storage"):
+        module.init_storage()
+    if hasattr(module, "start_job_workers"):
+        module.start_job_workers(application)
+else:
+    import agent, db, llm
+    application = module.app
+    for legacy in (module, agent, db, llm):
+        for name in ("SAVE_FOLDER", "DB_PATH", "DEEPSEEK_API_URL"):
+            attr = "API_URL" if name == "DEEPSEEK_API_URL" else name
+            if hasattr(legacy, attr):
+                setattr(legacy, attr, os.environ[name])
+    agent.init_db()
+    db.init_db()
+application.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)
+"""
+# 等待服务器启动的最长时间（秒）
+SERVER_START_TIMEOUT = 30
+# 短于这个长度的 task 回复是错误提示而不是文章
+MIN_PASSAGE_LENGTH = 200
+# task 提交为生成任务后，查询任务状态的间隔（秒）
+JOB_POLL_SECONDS = 0.2
+
+
+class Anonymizer:
+    """
+    确定性的文字替换：同一次导出中相同的单词总是替换为相同的词，
+    保留长度、数字、标点和段落引用，原文无法从结果中还原（盐值随机生成且不保存）
+    """
+
+    def __init__(self):
+        self.salt = os.urandom(16)
+        with open(VOCABULARY_PATH, encoding="utf-8") as f:
+            self.words = sorted(
+                line.split("\t")[0] for line in f if line.strip() and not line.startswith("#")
+            )
+
+    def _pick(self, token, pool):
+        digest = hashlib.sha256(self.salt + token.encode("utf-8")).digest()
+        return pool[int.from_bytes(digest[:4], "big") % len(pool)]
+
+    def _word(self, match):
+        word = match.group(0)
+        replacement = self._pick(word.lower(), self.words)
+        return replacement.capitalize() if word[0].isupper() else replacement
+
+    def _text(self, text):
+        text = WORD_RE.sub(self._word, text)
+        return CJK_RE.sub(lambda m: self._pick(m.group(0), CJK_POOL), text)
+
+    def __call__(self, text):
+        if not text or text.strip().lower() in COMMANDS:
+            return text
+        # 段落引用之间的文字逐段替换
+        parts, last = [], 0
+        for m in KEEP_RE.finditer(text):
+            parts.append(self._text(text[last:m.start()]))
+            parts.append(m.group(0))
+            last = m.end()
+        parts.append(self._text(text[last:]))
+        return "".join(parts)
+
+
+def parse_timestamp(value):
+    """
+    解析 SQLite CURRENT_TIMESTAMP 格式的时间
+    """
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def export_trace(args):
+    """
+    导出匿名化的会话
+    """
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    where, params = [], []
+    if args.since:
+        where.append("timestamp >= ?")
+        params.append(args.since)
+    if args.until:
+        where.append("timestamp < ?")
+        params.append(args.until)
+    rows = conn.execute(
+        "SELECT session_id, user_message, ai_response, message_type, timestamp FROM chat_history "
+        + ("WHERE " + " AND ".join(where) if where else "") + " ORDER BY id",
+        params,
+    ).fetchall()
+    conn.close()
+    if not rows:
+        print("没有符合条件的聊天记录")
+        return
+
+    anonymize = (lambda text: text) if args.keep_text else Anonymizer()
+    sessions = {}
+    start = parse_timestamp(rows[0][4])
+    with open(args.out, "w", encoding="utf-8") as f:
+        for session_id, message, response, message_type, timestamp in rows:
+            if session_id not in sessions:
+                sessions[session_id] = f"s{len(sessions) + 1:04d}"
+            event = {
+                "session": sessions[session_id],
+                "offset": (parse_timestamp(timestamp) - start).total_seconds(),
+                "type": message_type,
+                "message": anonymize(message),
+                # 生成的文章不含用户信息，原样保留以便通过服务器的格式检查；生成失败的记录没有文章
+                "response": (response if len(response or "") >= MIN_PASSAGE_LENGTH else None)
+                if message_type == "task" else anonymize(response),
+            }
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    print(f"已导出 {len(rows)} 条消息、{len(sessions)} 个会话: {args.out}")
+
+
+def load_trace(path, speed, max_gap):
+    """
+    读取录制文件，计算每条消息在回放中的发送时间
+    相邻消息的间隔先截断到 max_gap 秒，再除以 speed
+
+    Returns:
+        tuple: (按会话分组的消息 {session: [(发送时间, 消息)]}, 录制的全部消息)
+    """
+    with open(path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    events.sort(key=lambda e: e["offset"])
+
+    sessions = defaultdict(list)
+    previous, at = None, 0.0
+    for event in events:
+        if previous is not None:
+            at += min(event["offset"] - previous, max_gap) / speed
+        previous = event["offset"]
+        sessions[event["session"]].append((at, event))
+    return sessions, events
+
+
+def db_size(db_path):
+    """
+    数据库文件（含 WAL）的总大小
+    """
+    return sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal", "-shm")
+               if os.path.exists(db_path + suffix))
+
+
+def table_rows(db_path):
+    """
+    统计各表的行数
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    rows = {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+    conn.close()
+    return rows
+
+
+def percentiles(values):
+    """
+    延迟分布（秒）
+    """
+    if not values:
+        return None
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(int(len(values) * p), len(values) - 1)]
+
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": rank(0.50),
+        "p90": rank(0.90),
+        "p99": rank(0.99),
+        "max": values[-1],
+    }
+
+
+def build_label(build):
+    """
+    版本标识：目录名加 git 提交号（不是 git 仓库时只用目录名）
+    """
+    name = os.path.basename(os.path.abspath(build))
+    try:
+        rev = subprocess.run(["git", "-C", build, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        return f"{name}@{rev}"
+    except (OSError, subprocess.CalledProcessError):
+        return name
+
+
+def build_server_command(args):
+    """
+    返回启动被测服务器的命令
+
+    Returns:
+        tuple: (命令列表, 额外环境变量, 服务器模式说明)
+    """
+    if args.server_cmd:
+        cmd = [part.format(python=sys.executable, port=args.port) for part in shlex.split(args.server_cmd)]
+        return cmd, {}, "custom"
+    mode = args.server
+    if mode == "sync" and not os.path.exists(os.path.join(args.build, "serve.py")):
+        print(f"{build_label(args.build)} 没有 serve.py，改用 app.py 中的 Flask 应用（--server app）")
+        mode = "app"
+    if mode == "app":
+        return [sys.executable, "-c", APP_LAUNCHER, str(args.port)], {}, mode
+    cmd, extra_env = server_command(mode, args.port, args.threads)
+    return cmd, extra_env, mode
+
+
+def wait_server(proc, url, log_path):
+    """
+    等待服务器可以响应请求；进程提前退出或超时时报错并给出日志路径
+    """
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务器进程已退出（返回码 {proc.returncode}），日志: {log_path}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"服务器 {SERVER_START_TIMEOUT} 秒内没有启动，日志: {log_path}")
+
+
+def send_message(client, base, message, deadline):
+    """
+    发送一条消息；task 返回生成任务时一直等到任务结束，延迟包含排队和生成的时间
+    （旧版本的服务器直接返回结果）
+
+    Returns:
+        bool: 请求成功返回True
+    """
+    response = client.post(base + "/api/chat", json={"message": message},
+                           timeout=max(deadline - time.perf_counter(), 1))
+    if not response.ok:
+        return False
+    data = response.json()
+    while data.get("status") in ("queued", "running"):
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(JOB_POLL_SECONDS)
+        response = client.get(f"{base}/api/jobs/{data['job_id']}", timeout=max(deadline - time.perf_counter(), 1))
+        if not response.ok:
+            return False
+        data = response.json()
+    return data.get("status", "done") == "done"
+
+
+def run_trace(args):
+    """
+    回放录制文件并保存结果
+    """
+    sessions, events = load_trace(args.trace, args.speed, args.max_gap)
+    replies = {e["message"]: e["response"] for e in events if e["type"] != "task"}
+    passages = [e["response"] for e in events if e["type"] == "task" and e["response"]]
+
+    llm = make_recorded_server(args.llm_port, args.llm_delay, args.generation_delay, replies, passages)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+
+    tmp = tempfile.mkdtemp(prefix="replay_")
+    db_path = os.path.join(tmp, "replay.db")
+    cmd, extra_env, mode = build_server_command(args)
+    env = dict(os.environ, SAVE_FOLDER=tmp, DB_PATH=db_path, DEEPSEEK_API_KEY="replay",
+               DEEPSEEK_API_URL=f"http://127.0.0.1:{args.llm_port}/v1/chat/completions", **extra_env)
+    log_path = os.path.join(tmp, "server.log")
+    log = open(log_path, "w", encoding="utf-8")
+    proc = subprocess.Popen(cmd, cwd=args.build, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{args.port}"
+    results = []
+    lock = threading.Lock()
+
+    def replay_session(items):
+        # 每个会话一个 requests.Session，会话Cookie与原始会话一一对应；同一会话内的消息依次发送
+        client = requests.Session()
+        for at, event in items:
+            delay = start + at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                ok = send_message(client, base, event["message"], sent + args.timeout)
+            except requests.RequestException:
+                ok = False
+            with lock:
+                results.append((event["type"], time.perf_counter() - sent, ok))
+
+    try:
+        wait_server(proc, base + "/", log_path)
+        size_before = db_size(db_path)
+        print(f"回放 {len(events)} 条消息、{len(sessions)} 个会话（{build_label(args.build)}，{mode}）")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(min(len(sessions), args.max_clients)) as pool:
+            list(pool.map(replay_session, sessions.values()))
+        wall = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+        log.close()
+        llm.shutdown()
+
+    report = {
+        "build": build_label(args.build),
+        "server": mode,
+        "trace": os.path.basename(args.trace),
+        "speed": args.speed,
+        "max_gap": args.max_gap,
+        "wall_seconds": wall,
+        "requests": len(results),
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "latency": {
+            "all": percentiles([t for _, t, _ in results]),
+            **{kind: percentiles([t for k, t, _ in results if k == kind])
+               for kind in sorted({k for k, _, _ in results})},
+        },
+        "db": {
+            "bytes_before": size_before,
+            "bytes_after": db_size(db_path),
+            "growth": db_size(db_path) - size_before,
+            "rows": table_rows(db_path),
+        },
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    print(f"结果已保存: {args.out}")
+
+
+def print_report(report):
+    """
+    打印一次回放的结果
+    """
+    print(f"{report['requests']} 个请求，{report['errors']} 个失败，用时 {report['wall_seconds']:.1f}s")
+    for kind, dist in report["latency"].items():
+        if dist:
+            print(f"  {kind:6s} n={dist['count']:<5d} p50={dist['p50']:.3f}s p90={dist['p90']:.3f}s "
+                  f"p99={dist['p99']:.3f}s max={dist['max']:.3f}s")
+    print(f"  数据库增长 {report['db']['growth']} 字节")
+
+
+def compare(args):
+    """
+    对比两次回放的延迟分布和数据库增长
+    """
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def row(name, a, b, unit=""):
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "-"
+        fmt = "{:.3f}" if isinstance(a, float) or isinstance(b, float) else "{}"
+        print(f"{name:28s} {fmt.format(a) + unit:>14s} {fmt.format(b) + unit:>14s} {change:>9s}")
+
+    print(f"{'':28s} {base['build']:>14s} {new['build']:>14s} {'change':>9s}")
+    row("requests", base["requests"], new["requests"])
+    row("errors", base["errors"], new["errors"])
+    for kind in sorted(set(base["latency"]) | set(new["latency"])):
+        a, b = base["latency"].get(kind), new["latency"].get(kind)
+        if not a or not b:
+            continue
+        for key in ("p50", "p90", "p99", "max"):
+            row(f"{kind} {key}", a[key], b[key], "s")
+    row("db growth (bytes)", base["db"]["growth"], new["db"]["growth"])
+    for table in sorted(set(base["db"]["rows"]) | set(new["db"]["rows"])):
+        row(f"rows {table}", base["db"]["rows"].get(table, 0), new["db"]["rows"].get(table, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, replay and compare recorded chat traffic")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="export anonymized sessions from chat_history")
+    p.add_argument("--db", required=True, help="source database")
+    p.add_argument("--out", default="trace.jsonl")
+    p.add_argument("--since", help="YYYY-MM-DD, inclusive")
+    p.add_argument("--until", help="YYYY-MM-DD, exclusive")
+    p.add_argument("--keep-text", action="store_true", help="do not anonymize message text")
+    p.set_defaults(func=export_trace)
+
+    p = sub.add_parser("run", help="replay a trace against a freshly started build")
+    p.add_argument("--trace", required=True)
+    p.add_argument("--out", required=True, help="result file (JSON)")
+    p.add_argument("--build", default=ROOT, help="checkout to run (default: this repository)")
+    p.add_argument("--server", choices=("sync", "async", "app"), default="sync",
+                   help="sync: serve.py (waitress), async: uvicorn asgi, app: the Flask app in app.py")
+    p.add_argument("--server-cmd", help="custom server command run in --build; {python} and {port} are substituted")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed-up factor")
+    p.add_argument("--max-gap", type=float, default=30.0, help="cap idle gaps between messages (seconds)")
+    p.add_argument("--llm-delay", type=float, default=1.0, help="simulated chat reply latency (seconds)")
+    p.add_argument("--generation-delay", type=float, default=5.0, help="simulated passage generation latency")
+    p.add_argument("--threads", type=int, default=64, help="waitress threads for the sync server")
+    p.add_argument("--max-clients", type=int, default=256, help="sessions replayed concurrently")
+    p.add_argument("--timeout", type=float, default=600)
+    p.add_argument("--port", type=int, default=8802)
+    p.add_argument("--llm-port", type=int, default=8901)
+    p.set_defaults(func=run_trace)
+
+    p = sub.add_parser("compare", help="compare two replay results")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# compression.py - 响应压缩模块
+# 按客户端的 Accept-Encoding 选择 brotli 或 gzip 压缩较大的文本/JSON 响应体，
+# Flask 路由（after_app_request）和 asgi.py 的异步 /api/chat 共用同一套规则
+
+import gzip  # gzip 压缩
+
+from werkzeug.http import parse_accept_header  # 解析 Accept-Encoding（含 q 值）
+
+# brotli 为可选依赖：未安装时只使用 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于这个大小的响应体不压缩（压缩收益小于额外的CPU开销）
+MIN_SIZE = 1024
+
+# 可压缩的内容类型
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# 压缩级别：brotli 5 和 gzip 6 在速度和压缩率之间比较均衡
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def choose_encoding(accept_encoding):
+    """
+    按 Accept-Encoding 选择压缩方式，同等权重时优先 brotli
+
+    Args:
+        accept_encoding (str): 请求头 Accept-Encoding 的值
+
+    Returns:
+        str: "br"、"gzip"，客户端不支持时返回None
+    """
+    accept = parse_accept_header(accept_encoding or "")
+    candidates = (("br", "gzip") if brotli else ("gzip",))
+    best = max(candidates, key=lambda encoding: accept.quality(encoding))
+    return best if accept.quality(best) > 0 else None
+
+
+def should_compress(body, content_type):
+    """
+    判断响应体是否值得压缩
+
+    Args:
+        body (bytes): 响应体
+        content_type (str): 响应的 Content-Type
+
+    Returns:
+        bool: 需要压缩返回True
+    """
+    return len(body) >= MIN_SIZE and (content_type or "").startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body, encoding):
+    """
+    压缩响应体
+
+    Args:
+        body (bytes): 响应体
+        encoding (str): choose_encoding() 的结果
+
+    Returns:
+        bytes: 压缩后的响应体
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encoding):
+    """
+    压缩 Flask/Werkzeug 响应（就地修改）
+    文件下载、流式响应和已编码的响应保持不变
+
+    Args:
+        response (flask.Response): 响应对象
+        accept_encoding (str): 请求头 Accept-Encoding 的值
+
+    Returns:
+        flask.Response: 同一个响应对象
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers):
+        return response
+    # 无论是否压缩，缓存都需要按 Accept-Encoding 区分
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = choose_encoding(accept_encoding)
+    if not encoding or not should_compress(body, response.content_type):
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # 压缩后的字节与原文不同，强 ETag 降级为弱 ETag（内容相同，仍可用于条件请求）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
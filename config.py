@@ -0,0 +1,58 @@
+# config.py - 配置模块
+# 从环境变量（以及可选的 .env 文件）解析运行配置
+# 只在应用工厂或命令行入口处加载一次，导入本模块本身没有副作用
+
+import os  # 操作系统接口模块
+
+# 默认配置，与 .env.example 中的可选项对应
+DEFAULT_SAVE_FOLDER = r"E:\English_text"
+DEFAULT_FONT_PATH = r"D:\downLoad\Fast-Font-main\Fast-Font-main\Fast_Sans.ttf"
+DEFAULT_FONT_NAME = "Fast_Sans"
+DEFAULT_DB_PATH = os.path.join(DEFAULT_SAVE_FOLDER, "english_learning.db")
+
+# 已加载的配置，None 表示尚未加载
+_config = None
+
+
+def load_config(reload=False):
+    """
+    加载运行配置
+    首次调用时读取 .env 文件并解析环境变量，之后直接返回缓存结果
+
+    Args:
+        reload (bool): 是否强制重新加载
+
+    Returns:
+        dict: 配置字典
+    """
+    global _config
+    if _config is not None and not reload:
+        return _config
+
+    # python-dotenv 只在真正加载配置时才导入
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    save_folder = os.getenv("SAVE_FOLDER") or DEFAULT_SAVE_FOLDER
+    _config = {
+        "SAVE_FOLDER": save_folder,
+        "DB_PATH": os.getenv("DB_PATH") or os.path.join(save_folder, "english_learning.db"),
+        "FONT_PATH": os.getenv("FONT_PATH") or DEFAULT_FONT_PATH,
+        "FONT_NAME": os.getenv("FONT_NAME") or DEFAULT_FONT_NAME,
+        "SECRET_KEY": os.getenv("SECRET_KEY") or "english_learning_assistant_secret_key_2024",
+        # 预生成调度器：低峰时间窗口（HH:MM-HH:MM，可跨午夜）、随机延迟上限和每天备好的阅读篇数
+        "SCHEDULE_WINDOW": os.getenv("SCHEDULE_WINDOW") or "02:00-05:00",
+        "SCHEDULE_JITTER_MINUTES": int(os.getenv("SCHEDULE_JITTER_MINUTES") or 60),
+        "SCHEDULE_READINGS": int(os.getenv("SCHEDULE_READINGS") or 3),
+        # 生成文章的词数允许范围（提示词要求 600–900 词，默认允许 10% 的误差）
+        "PASSAGE_MIN_WORDS": int(os.getenv("PASSAGE_MIN_WORDS") or 540),
+        "PASSAGE_MAX_WORDS": int(os.getenv("PASSAGE_MAX_WORDS") or 990),
+        # 每个 Web 进程中执行生成任务的工作线程数（0 表示由单独的 python jobs.py 进程执行）
+        "JOB_WORKERS": int(os.getenv("JOB_WORKERS") or 2),
+        # 按需性能分析：抽样比例（0 表示关闭）、强制分析用的管理员令牌、分析文件目录和保留数量
+        "PROFILE_SAMPLE_RATE": float(os.getenv("PROFILE_SAMPLE_RATE") or 0),
+        "PROFILE_ADMIN_TOKEN": os.getenv("PROFILE_ADMIN_TOKEN") or "",
+        "PROFILE_DIR": os.getenv("PROFILE_DIR") or os.path.join(save_folder, "profiles"),
+        "PROFILE_KEEP": int(os.getenv("PROFILE_KEEP") or 100),
+    }
+    return _config
@@ -2,23 +2,57 @@
 # 提供英语学习助手的数据库相关功能
 
 import sqlite3  # SQLite数据库操作模块
+import json  # 生成任务结果的序列化
 import os  # 操作系统接口模块
+import profiling  # 被分析的请求中数据库耗时计入 db 阶段
+from config import DEFAULT_DB_PATH  # 默认数据库路径
 
-# 数据库文件路径
-DB_PATH = r"E:\English_text\english_learning.db"
+# 数据库文件路径，启动时由 configure() 按配置覆盖
+# agent.py、dedup.py、调度器和统计模块都通过本模块访问同一个数据库
+DB_PATH = DEFAULT_DB_PATH
 
+# 旧版 dedup.py 使用的数据库（相对于当前目录），迁移时导入其中的去重哈希
+LEGACY_DEDUP_DB_PATH = "learning_assistant.db"
 
-def init_db():
+
+def configure(db_path):
     """
-    初始化数据库
-    创建必要的数据库表结构
+    设置数据库文件路径
+    
+    Args:
+        db_path (str): 数据库文件路径
     """
-    # 确保数据库目录存在
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    # 连接数据库
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    global DB_PATH
+    DB_PATH = db_path
+
+
+def connect(isolation_level=''):
+    """
+    打开数据库连接，并统一设置连接级别的参数
+    
+    Args:
+        isolation_level (str): 传给 sqlite3.connect，None 表示手动控制事务
+        
+    Returns:
+        sqlite3.Connection: 数据库连接
+    """
+    # 多进程/多线程写入时等待写锁，而不是立即报 database is locked
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=isolation_level,
+                           factory=profiling.connection_factory())
+    # WAL 模式下 NORMAL 已足够安全，且每次提交不再强制刷盘
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# =========================
+# 数据库迁移
+# =========================
 
+def _migration_1_baseline(c):
+    """
+    基线结构：合并此前 agent.py 和 db.py 各自创建的全部表
+    全部使用 IF NOT EXISTS，已有数据库上执行不会改变现有数据
+    """
     # 创建学习记录表
     # 用于存储学习状态、主题、步骤和内容
     c.execute("""
@@ -53,12 +87,283 @@ def init_db():
     )
     """)
 
-    # 提交事务并关闭连接
-    conn.commit()
+    # 创建阅读材料表
+    # 生成的阅读材料解析一次后结构化存储，供上下文检索使用
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS passages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，自增ID
+        session_id TEXT,                       -- 生成该材料的会话ID
+        title TEXT,                            -- 文章标题
+        content TEXT,                          -- 完整原文
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP  -- 时间戳
+    )
+    """)
+
+    # 创建阅读材料分段表
+    # 每个段落或题目一行，kind 区分 paragraph/question
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS passage_segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，自增ID
+        passage_id INTEGER,                    -- 所属阅读材料ID
+        kind TEXT,                             -- 类型：paragraph/question
+        position INTEGER,                      -- 在同类中的序号（从0开始）
+        text TEXT                              -- 段落或题目文本
+    )
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_passages_session ON passages (session_id, id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_passage_segments_passage ON passage_segments (passage_id, kind, position)"
+    )
+
+    # 创建维护任务记录表
+    # 记录启动清理等任务的上次执行时间，多个工作进程只执行一次
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_runs (
+        name TEXT PRIMARY KEY,                 -- 任务名称
+        last_run DATETIME                      -- 上次执行时间
+    )
+    """)
+
+    # 创建预生成阅读表
+    # 存储调度器在低峰期预先生成、尚未发放的阅读
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS prepared_reading (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，自增ID
+        content TEXT,                          -- 阅读内容
+        run_date TEXT,                         -- 生成该阅读的调度日期
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 生成时间
+        claimed_at DATETIME                    -- 发放时间，未发放为NULL
+    )
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_prepared_reading_unclaimed ON prepared_reading (claimed_at, id)"
+    )
+
+    # 创建阅读统计表
+    # 每篇阅读的统计数据（保存时计算一次），汇总查询只扫描这张表
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS passage_stats (
+        state_id INTEGER PRIMARY KEY,          -- learning_state 记录ID
+        topic TEXT,                            -- 主题
+        word_count INTEGER,                    -- 正文词数
+        sentence_count INTEGER,                -- 句数
+        unique_words INTEGER,                  -- 不同单词数
+        cet6_words INTEGER,                    -- CET-6 词汇出现次数
+        postgrad_words INTEGER,                -- 考研词汇出现次数
+        cet6_ratio REAL,                       -- CET-6 词汇覆盖率
+        postgrad_ratio REAL,                   -- 考研词汇覆盖率
+        flesch_reading_ease REAL,              -- Flesch 可读性
+        fk_grade REAL,                         -- Flesch-Kincaid 年级
+        question_count INTEGER,                -- 题目数
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP  -- 时间戳
+    )
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_passage_stats_created ON passage_stats (created_at)"
+    )
+
+    # 创建生成记录表
+    # 记录每次生成的选题和重试情况（LLM调用次数、重复、不合格、空结果）
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS generation_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，自增ID
+        state_id INTEGER,                      -- 成功时对应的 learning_state ID
+        domain TEXT,                           -- 领域
+        subtopic TEXT,                         -- 子话题
+        style TEXT,                            -- 文体
+        attempts INTEGER,                      -- LLM调用次数
+        duplicates INTEGER,                    -- 重复内容次数
+        rejected INTEGER,                      -- 不合格次数
+        empty INTEGER,                         -- 空结果次数
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP  -- 时间戳
+    )
+    """)
+
+    # 创建调度器运行记录表，每个日期一条
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_run (
+        run_date TEXT PRIMARY KEY,             -- 日期 YYYY-MM-DD
+        status TEXT,                           -- running / done / failed
+        generated INTEGER DEFAULT 0,           -- 生成的篇数
+        started_at DATETIME,                   -- 开始时间
+        finished_at DATETIME                   -- 结束时间
+    )
+    """)
+
+    # 创建调度器锁表，heartbeat 由持有者定期刷新
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_lock (
+        name TEXT PRIMARY KEY,                 -- 锁名称
+        owner TEXT,                            -- 持有者标识
+        heartbeat DATETIME                     -- 最近一次心跳
+    )
+    """)
+
+
+def _migration_2_unify_content_hashes(c):
+    """
+    合并去重记录：agent.py 的 sent_hash 表和旧 dedup.py 数据库中的 pushed_code 表
+    统一并入 sent_content，之后所有模块共用同一张去重表
+    """
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sent_hash'")
+    if c.fetchone():
+        c.execute("INSERT OR IGNORE INTO sent_content (content_hash) SELECT hash FROM sent_hash")
+        c.execute("DROP TABLE sent_hash")
+
+    # 旧数据库只读打开并导入，原文件保持不变
+    if os.path.exists(LEGACY_DEDUP_DB_PATH) and os.path.abspath(LEGACY_DEDUP_DB_PATH) != os.path.abspath(DB_PATH):
+        legacy = sqlite3.connect(f"file:{LEGACY_DEDUP_DB_PATH}?mode=ro", uri=True)
+        try:
+            rows = legacy.execute("SELECT hash FROM pushed_code").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        legacy.close()
+        c.executemany("INSERT OR IGNORE INTO sent_content (content_hash) VALUES (?)", rows)
+
+
+def _migration_3_chat_history_indexes(c):
+    """
+    为聊天历史的常用查询建立索引：按会话取最近记录、按会话取最新任务、按时间清理
+    """
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, message_type, id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)"
+    )
+
+
+def _migration_4_generation_jobs(c):
+    """
+    阅读生成任务队列：task 请求写入任务后立即返回，由工作线程领取执行
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS generation_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，即返回给客户端的任务ID
+        session_id TEXT,                       -- 提交任务的会话ID
+        idempotency_key TEXT,                  -- 客户端提供的幂等键，同一会话内唯一
+        message TEXT,                          -- 用户消息
+        status TEXT DEFAULT 'queued',          -- queued / running / done / failed
+        attempts INTEGER DEFAULT 0,            -- 已被领取的次数
+        worker TEXT,                           -- 当前执行者
+        heartbeat DATETIME,                    -- 执行者最近一次心跳
+        result TEXT,                           -- 完成后的响应数据（JSON）
+        error TEXT,                            -- 失败原因
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 提交时间
+        finished_at DATETIME                   -- 完成时间
+    )
+    """)
+    c.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_generation_jobs_key "
+        "ON generation_jobs (session_id, idempotency_key) WHERE idempotency_key IS NOT NULL"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, id)"
+    )
+
+
+def _migration_5_answer_grading(c):
+    """
+    阅读理解答案的批改：按（文章, 答案）哈希缓存的批改结果，以及每次提交的记录（用于学习进度）
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS answer_grades (
+        answers_hash TEXT PRIMARY KEY,         -- 文章ID和规范化答案的哈希
+        passage_id INTEGER,                    -- 阅读材料ID
+        answers TEXT,                          -- 答案列表（JSON）
+        grades TEXT,                           -- 每题的批改结果（JSON）
+        score REAL,                            -- 得分
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP  -- 批改时间
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS answer_submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 主键，自增ID
+        session_id TEXT,                       -- 提交答案的会话ID
+        passage_id INTEGER,                    -- 阅读材料ID
+        answers_hash TEXT,                     -- 对应的批改结果
+        score REAL,                            -- 得分
+        total INTEGER,                         -- 题目数
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP  -- 提交时间
+    )
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_answer_submissions_session ON answer_submissions (session_id, id)"
+    )
+
+
+# 迁移列表：(版本号, 名称, 函数)，只能在末尾追加，已发布的迁移不要修改
+MIGRATIONS = [
+    (1, "baseline", _migration_1_baseline),
+    (2, "unify content hashes", _migration_2_unify_content_hashes),
+    (3, "chat history indexes", _migration_3_chat_history_indexes),
+    (4, "generation jobs", _migration_4_generation_jobs),
+    (5, "answer grading", _migration_5_answer_grading),
+]
+
+
+def get_schema_version():
+    """
+    获取数据库当前的结构版本
+    
+    Returns:
+        int: 已执行的最高迁移版本，未初始化时返回0
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not c.fetchone():
+        conn.close()
+        return 0
+    c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    version = c.fetchone()[0]
     conn.close()
+    return version
 
 
-def save_learning_state(topic, step, content):
+def init_db():
+    """
+    初始化数据库
+    按顺序执行尚未执行的迁移，并在 schema_version 表中记录版本
+    整个过程在一个写事务中完成，多个工作进程同时启动时只有一个会真正执行迁移
+    """
+    # 确保数据库目录存在
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    # 连接数据库，手动控制事务
+    conn = connect(isolation_level=None)
+    c = conn.cursor()
+
+    # WAL 模式允许读写并发，多进程部署时避免读请求被写请求阻塞
+    # 该设置持久保存在数据库文件中，且必须在事务之外执行
+    c.execute("PRAGMA journal_mode=WAL")
+
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,           -- 迁移版本号
+            name TEXT,                             -- 迁移名称
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP  -- 执行时间
+        )
+        """)
+        c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current = c.fetchone()[0]
+        for version, name, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(c)
+            c.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def save_learning_state(topic, step, content, stats=None):
     """
     保存学习状态到数据库
     
@@ -66,18 +371,33 @@ def save_learning_state(topic, step, content):
         topic (str): 学习主题
         step (int): 学习步骤
         content (str): 学习内容
+        stats (dict): analytics.analyze() 的结果，提供时在同一事务中保存，默认为None
+        
+    Returns:
+        int: 新学习状态记录的ID
     """
     # 连接数据库
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     # 插入学习状态记录
     c.execute(
         "INSERT INTO learning_state (topic, step, content) VALUES (?, ?, ?)",
         (topic, step, content)
     )
+    state_id = c.lastrowid
+    if stats is not None:
+        c.execute(
+            "INSERT OR REPLACE INTO passage_stats (state_id, topic, word_count, sentence_count, unique_words, "
+            "cet6_words, postgrad_words, cet6_ratio, postgrad_ratio, flesch_reading_ease, fk_grade, question_count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (state_id, topic, stats["word_count"], stats["sentence_count"], stats["unique_words"],
+             stats["cet6_words"], stats["postgrad_words"], stats["cet6_ratio"], stats["postgrad_ratio"],
+             stats["flesch_reading_ease"], stats["fk_grade"], stats["question_count"])
+        )
     # 提交事务并关闭连接
     conn.commit()
     conn.close()
+    return state_id
 
 
 def get_latest_state():
@@ -88,7 +408,7 @@ def get_latest_state():
         tuple: (主题, 步骤) 如果没有记录则返回默认值 ("English Reading", 0)
     """
     # 连接数据库
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     # 查询最新的学习状态记录
     c.execute(
@@ -100,6 +420,46 @@ def get_latest_state():
     return row if row else ("English Reading", 0)
 
 
+def iter_readings(since=None, until=None, limit=None, batch_size=50):
+    """
+    按时间顺序逐批读出生成过的阅读（生成器，不会一次性载入全部内容）
+    
+    Args:
+        since (str): 起始日期（含），格式 YYYY-MM-DD，默认为None
+        until (str): 结束日期（不含），格式 YYYY-MM-DD，默认为None
+        limit (int): 最多返回的篇数，默认为None
+        batch_size (int): 每批从数据库读取的行数
+        
+    Yields:
+        tuple: (id, topic, content, timestamp)
+    """
+    where, params = ["content IS NOT NULL AND content != ''"], []
+    if since:
+        where.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        where.append("timestamp < ?")
+        params.append(until)
+    sql = "SELECT id, topic, content, timestamp FROM learning_state WHERE {} ORDER BY id".format(
+        " AND ".join(where)
+    )
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    conn = connect()
+    try:
+        c = conn.cursor()
+        c.execute(sql, params)
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
 def is_content_sent(content_hash):
     """
     检查内容是否已经发送过（通过哈希值判断）
@@ -111,7 +471,7 @@ def is_content_sent(content_hash):
         bool: 如果内容已发送过返回True，否则返回False
     """
     # 连接数据库
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     # 查询是否存在相同哈希值的记录
     c.execute(
@@ -132,7 +492,7 @@ def mark_content_sent(content_hash):
         content_hash (str): 内容的哈希值
     """
     # 连接数据库
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     # 插入哈希值记录，如果已存在则忽略（INSERT OR IGNORE）
     c.execute(
@@ -143,6 +503,87 @@ def mark_content_sent(content_hash):
     conn.commit()
     conn.close()
 
+def log_generation(state_id, choice, attempts, duplicates, rejected, empty):
+    """
+    记录一次生成的选题和重试情况
+    
+    Args:
+        state_id (int): 成功时对应的学习状态ID，失败时为None
+        choice (dict): sampler.sample() 选定的 domain/subtopic/style
+        attempts (int): LLM调用次数
+        duplicates (int): 重复内容次数
+        rejected (int): 不合格次数
+        empty (int): 空结果次数
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO generation_log (state_id, domain, subtopic, style, attempts, duplicates, rejected, empty) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (state_id, choice["domain"], choice["subtopic"], choice["style"], attempts, duplicates, rejected, empty)
+    )
+    conn.commit()
+    conn.close()
+
+
+def save_prepared_reading(content, run_date):
+    """
+    保存一篇预生成的阅读
+    
+    Args:
+        content (str): 阅读内容
+        run_date (str): 调度日期 YYYY-MM-DD
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO prepared_reading (content, run_date) VALUES (?, ?)",
+        (content, run_date)
+    )
+    conn.commit()
+    conn.close()
+
+
+def count_prepared_readings():
+    """
+    统计尚未发放的预生成阅读数量
+    
+    Returns:
+        int: 未发放的篇数
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM prepared_reading WHERE claimed_at IS NULL")
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+
+def claim_prepared_reading():
+    """
+    领取最早的一篇预生成阅读
+    BEGIN IMMEDIATE 保证多个进程不会领取到同一篇
+    
+    Returns:
+        str: 阅读内容，没有可领取的阅读时返回None
+    """
+    conn = connect(isolation_level=None)
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    c.execute(
+        "SELECT id, content FROM prepared_reading WHERE claimed_at IS NULL ORDER BY id LIMIT 1"
+    )
+    row = c.fetchone()
+    if row:
+        c.execute(
+            "UPDATE prepared_reading SET claimed_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (row[0],)
+        )
+    c.execute("COMMIT")
+    conn.close()
+    return row[1] if row else None
+
+
 def save_chat_history(session_id, user_message, ai_response, message_type='chat'):
     """
     保存聊天历史记录
@@ -153,7 +594,7 @@ def save_chat_history(session_id, user_message, ai_response, message_type='chat'
         ai_response (str): AI响应
         message_type (str): 消息类型，默认为'chat'
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     c.execute(
         "INSERT INTO chat_history (session_id, user_message, ai_response, message_type) VALUES (?, ?, ?, ?)",
@@ -174,7 +615,7 @@ def get_chat_history(session_id, limit=10):
     Returns:
         list: 聊天历史记录列表，每个元素为(user_message, ai_response, message_type, timestamp)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     c.execute(
         "SELECT user_message, ai_response, message_type, timestamp FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
@@ -196,7 +637,7 @@ def get_latest_task_content(session_id):
     Returns:
         str: 最新的任务内容，如果没有则返回None
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     c.execute(
         "SELECT ai_response FROM chat_history WHERE session_id = ? AND message_type = 'task' ORDER BY id DESC LIMIT 1",
@@ -214,10 +655,442 @@ def clear_old_chat_history(days=7):
     Args:
         days (int): 保留天数，默认为7天
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     c.execute(
         "DELETE FROM chat_history WHERE timestamp < datetime('now', '-{} days')".format(days)
     )
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+
+def clear_session_history(session_id):
+    """
+    清除指定会话的聊天历史，并解除该会话与阅读材料的关联
+    阅读材料本身保留以便导出和统计
+    
+    Args:
+        session_id (str): 会话ID
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+    c.execute(
+        "UPDATE passages SET session_id = NULL WHERE session_id = ?",
+        (session_id,)
+    )
+    conn.commit()
+    conn.close()
+
+
+def save_passage(session_id, content, parsed):
+    """
+    保存解析后的阅读材料
+
+    Args:
+        session_id (str): 会话ID
+        content (str): 阅读材料全文
+        parsed (dict): passage.parse_passage() 的解析结果
+
+    Returns:
+        int: 新阅读材料的ID
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO passages (session_id, title, content) VALUES (?, ?, ?)",
+        (session_id, parsed["title"], content)
+    )
+    passage_id = c.lastrowid
+    rows = [(passage_id, 'paragraph', i, text) for i, text in enumerate(parsed["paragraphs"])]
+    rows += [(passage_id, 'question', i, text) for i, text in enumerate(parsed["questions"])]
+    c.executemany(
+        "INSERT INTO passage_segments (passage_id, kind, position, text) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    conn.close()
+    return passage_id
+
+
+def get_latest_passage_id(session_id):
+    """
+    获取指定会话中最新阅读材料的ID
+
+    Args:
+        session_id (str): 会话ID
+
+    Returns:
+        int: 阅读材料ID，如果没有则返回None
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT id FROM passages WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+        (session_id,)
+    )
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def get_passage(passage_id):
+    """
+    获取结构化的阅读材料
+
+    Args:
+        passage_id (int): 阅读材料ID
+
+    Returns:
+        dict: {"id", "title", "paragraphs", "questions"}，如果不存在则返回None
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("SELECT title FROM passages WHERE id = ?", (passage_id,))
+    row = c.fetchone()
+    if not row:
+        conn.close()
+        return None
+    c.execute(
+        "SELECT kind, text FROM passage_segments WHERE passage_id = ? ORDER BY kind, position",
+        (passage_id,)
+    )
+    segments = c.fetchall()
+    conn.close()
+    return {
+        "id": passage_id,
+        "title": row[0],
+        "paragraphs": [text for kind, text in segments if kind == 'paragraph'],
+        "questions": [text for kind, text in segments if kind == 'question'],
+    }
+
+
+def get_passage_content(passage_id):
+    """
+    获取阅读材料的完整原文（内容保存后不再修改）
+
+    Args:
+        passage_id (int): 阅读材料ID
+
+    Returns:
+        dict: {"id", "title", "content", "timestamp"}，如果不存在则返回None
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("SELECT title, content, timestamp FROM passages WHERE id = ?", (passage_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {"id": passage_id, "title": row[0], "content": row[1], "timestamp": row[2]}
+
+
+def get_answer_grades(answers_hash):
+    """
+    查询已缓存的批改结果
+    
+    Args:
+        answers_hash (str): 文章ID和规范化答案的哈希
+        
+    Returns:
+        dict: {"grades", "score"}，没有缓存时返回None
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute("SELECT grades, score FROM answer_grades WHERE answers_hash = ?", (answers_hash,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {"grades": json.loads(row[0]), "score": row[1]}
+
+
+def save_answer_grades(answers_hash, passage_id, answers, grades, score):
+    """
+    缓存一次批改结果（同一哈希并发批改时保留先写入的结果）
+    
+    Args:
+        answers_hash (str): 文章ID和规范化答案的哈希
+        passage_id (int): 阅读材料ID
+        answers (list): 答案列表
+        grades (list): 每题的批改结果
+        score (float): 得分
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "INSERT OR IGNORE INTO answer_grades (answers_hash, passage_id, answers, grades, score) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (answers_hash, passage_id, json.dumps(answers, ensure_ascii=False), json.dumps(grades, ensure_ascii=False), score)
+    )
+    conn.commit()
+    conn.close()
+
+
+def save_answer_submission(session_id, passage_id, answers_hash, score, total):
+    """
+    记录一次答案提交
+    
+    Args:
+        session_id (str): 会话ID
+        passage_id (int): 阅读材料ID
+        answers_hash (str): 对应的批改结果
+        score (float): 得分
+        total (int): 题目数
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO answer_submissions (session_id, passage_id, answers_hash, score, total) VALUES (?, ?, ?, ?, ?)",
+        (session_id, passage_id, answers_hash, score, total)
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_answer_submissions(session_id, limit=20):
+    """
+    获取指定会话最近的答案提交记录
+    
+    Args:
+        session_id (str): 会话ID
+        limit (int): 返回的最大条数，默认为20
+        
+    Returns:
+        list: [{"passage_id", "title", "score", "total", "timestamp"}]，按时间从新到旧排列
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT s.passage_id, p.title, s.score, s.total, s.timestamp FROM answer_submissions s "
+        "LEFT JOIN passages p ON p.id = s.passage_id "
+        "WHERE s.session_id = ? ORDER BY s.id DESC LIMIT ?",
+        (session_id, limit)
+    )
+    rows = c.fetchall()
+    conn.close()
+    return [
+        {"passage_id": row[0], "title": row[1], "score": row[2], "total": row[3], "timestamp": row[4]}
+        for row in rows
+    ]
+
+
+def enqueue_generation_job(session_id, message, idempotency_key=None):
+    """
+    提交一个阅读生成任务
+    同一会话已有相同幂等键的任务，或已有排队/执行中的任务时，返回已有的任务而不重复提交
+    
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        idempotency_key (str): 客户端提供的幂等键，默认为None
+        
+    Returns:
+        tuple: (任务ID, 是否新建)
+    """
+    conn = connect(isolation_level=None)
+    c = conn.cursor()
+    try:
+        # BEGIN IMMEDIATE 保证并发的重复提交不会同时通过检查
+        c.execute("BEGIN IMMEDIATE")
+        row = None
+        if idempotency_key:
+            c.execute(
+                "SELECT id FROM generation_jobs WHERE session_id = ? AND idempotency_key = ?",
+                (session_id, idempotency_key)
+            )
+            row = c.fetchone()
+        if not row:
+            c.execute(
+                "SELECT id FROM generation_jobs WHERE session_id = ? AND status IN ('queued', 'running') "
+                "ORDER BY id LIMIT 1",
+                (session_id,)
+            )
+            row = c.fetchone()
+        if row:
+            c.execute("ROLLBACK")
+            return row[0], False
+        c.execute(
+            "INSERT INTO generation_jobs (session_id, idempotency_key, message) VALUES (?, ?, ?)",
+            (session_id, idempotency_key or None, message)
+        )
+        job_id = c.lastrowid
+        c.execute("COMMIT")
+        return job_id, True
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def claim_generation_job(worker, stale_seconds, max_attempts):
+    """
+    领取最早的一个待执行任务
+    执行者心跳超时的任务视为执行者已退出，重新领取；领取次数达到上限的任务标记为失败
+    
+    Args:
+        worker (str): 执行者标识
+        stale_seconds (int): 心跳超时时间（秒）
+        max_attempts (int): 最大领取次数
+        
+    Returns:
+        dict: {"id", "session_id", "message"}，没有可领取的任务时返回None
+    """
+    stale = f"-{stale_seconds} seconds"
+    conn = connect(isolation_level=None)
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute(
+            "UPDATE generation_jobs SET status = 'failed', error = 'worker stopped', finished_at = datetime('now') "
+            "WHERE status = 'running' AND heartbeat < datetime('now', ?) AND attempts >= ?",
+            (stale, max_attempts)
+        )
+        c.execute(
+            "SELECT id, session_id, message FROM generation_jobs "
+            "WHERE status = 'queued' OR (status = 'running' AND heartbeat < datetime('now', ?)) "
+            "ORDER BY id LIMIT 1",
+            (stale,)
+        )
+        row = c.fetchone()
+        if row:
+            c.execute(
+                "UPDATE generation_jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "heartbeat = datetime('now') WHERE id = ?",
+                (worker, row[0])
+            )
+        c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {"id": row[0], "session_id": row[1], "message": row[2]}
+
+
+def heartbeat_generation_jobs(worker, job_ids):
+    """
+    更新执行者正在执行的任务的心跳
+    只刷新调用方确实还在执行的任务：记录结果失败而放弃的任务不再刷新，心跳超时后可被重新领取
+    
+    Args:
+        worker (str): 执行者标识
+        job_ids (list): 正在执行的任务ID
+    """
+    if not job_ids:
+        return
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE generation_jobs SET heartbeat = datetime('now') WHERE worker = ? AND status = 'running' "
+        "AND id IN ({})".format(", ".join("?" * len(job_ids))),
+        (worker, *job_ids)
+    )
+    conn.commit()
+    conn.close()
+
+
+def finish_generation_job(job_id, result=None, error=None):
+    """
+    记录任务的执行结果
+    任务被重新领取后，最先完成的执行者的结果生效
+    
+    Args:
+        job_id (int): 任务ID
+        result (dict): 响应数据，成功时提供
+        error (str): 失败原因，失败时提供
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE generation_jobs SET status = ?, result = ?, error = ?, finished_at = datetime('now') "
+        "WHERE id = ? AND status = 'running'",
+        ('failed' if error else 'done', json.dumps(result) if result is not None else None, error, job_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_generation_job(job_id):
+    """
+    查询任务状态
+    
+    Args:
+        job_id (int): 任务ID
+        
+    Returns:
+        dict: {"id", "session_id", "status", "result", "error"}，不存在时返回None
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT session_id, status, result, error FROM generation_jobs WHERE id = ?",
+        (job_id,)
+    )
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {
+        "id": job_id,
+        "session_id": row[0],
+        "status": row[1],
+        "result": json.loads(row[2]) if row[2] else None,
+        "error": row[3],
+    }
+
+
+def clear_old_generation_jobs(days=7):
+    """
+    清理指定天数之前已结束的任务
+    
+    Args:
+        days (int): 保留天数，默认为7天
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute(
+        "DELETE FROM generation_jobs WHERE status IN ('done', 'failed') "
+        "AND created_at < datetime('now', ?)",
+        ('-{} days'.format(days),)
+    )
+    conn.commit()
+    conn.close()
+
+
+def claim_maintenance(name, interval_hours=24):
+    """
+    认领一次维护任务
+    在写事务中检查并更新上次执行时间，多个进程同时调用时只有一个会成功
+    
+    Args:
+        name (str): 任务名称
+        interval_hours (int): 两次执行的最小间隔（小时），默认为24
+        
+    Returns:
+        bool: 认领成功（应当执行任务）返回True，否则返回False
+    """
+    conn = connect(isolation_level=None)
+    c = conn.cursor()
+    # BEGIN IMMEDIATE 立即获取写锁，保证检查和更新之间不会被其他进程插入
+    c.execute("BEGIN IMMEDIATE")
+    c.execute(
+        "SELECT 1 FROM maintenance_runs WHERE name = ? AND last_run > datetime('now', ?)",
+        (name, '-{} hours'.format(interval_hours))
+    )
+    if c.fetchone():
+        c.execute("ROLLBACK")
+        conn.close()
+        return False
+    c.execute(
+        "INSERT OR REPLACE INTO maintenance_runs (name, last_run) VALUES (?, datetime('now'))",
+        (name,)
+    )
+    c.execute("COMMIT")
+    conn.close()
+    return True
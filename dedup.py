@@ -2,7 +2,8 @@
 # 提供内容去重功能，防止生成重复的学习内容
 
 import hashlib  # 哈希算法模块
-import sqlite3  # SQLite数据库操作模块
+
+import db  # 数据库模块
 
 
 def calculate_hash(code):
@@ -28,16 +29,5 @@ def is_code_duplicate(code_hash):
     Returns:
         bool: 如果代码重复返回True，否则返回False
     """
-    # 连接数据库
-    conn = sqlite3.connect('learning_assistant.db')
-    cursor = conn.cursor()
-
-    # 查询是否存在相同哈希值的记录
-    cursor.execute('SELECT * FROM pushed_code WHERE hash = ?', (code_hash,))
-    result = cursor.fetchone()
-
-    # 关闭数据库连接
-    conn.close()
-
-    # 如果查询到记录则表示代码重复
-    return result is not None
+    # 与生成流程共用 sent_content 去重表（旧的 pushed_code 记录已由迁移导入）
+    return db.is_content_sent(code_hash)
@@ -0,0 +1,325 @@
+# export.py - 阅读合集导出模块
+# 将一段时间内的阅读按时间顺序合并成一个文件（Word 或 Markdown），开头带目录。
+# 阅读通过生成器逐篇从数据库读出并立即写入文件，内存中只保留目录所需的标题，
+# 导出几篇还是几百篇，内存占用基本不变。
+#
+# 用法：
+#   python agent.py export --since 2024-12-01 --until 2025-01-01
+#   python agent.py export --format md --limit 30 --output week.md
+#   GET /api/export?since=2024-12-01&until=2025-01-01&format=docx
+
+import argparse  # 命令行参数解析
+import os  # 文件和目录操作
+import re  # 正则表达式，用于过滤XML非法字符
+import zipfile  # DOCX 本质上是一个 zip 包
+from datetime import datetime  # 生成文件名
+from xml.sax.saxutils import escape  # XML转义
+
+import db  # 数据库模块
+from passage import clean_markdown, parse_passage  # 阅读材料结构化解析、Markdown清理
+
+# 支持的导出格式
+FORMATS = ("docx", "md")
+
+# 合集标题
+ANTHOLOGY_TITLE = "English Reading Anthology"
+
+# XML 1.0 不允许的控制字符
+INVALID_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# DOCX 包中除正文外的固定部分
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+PACKAGE_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+DOCUMENT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:docDefaults><w:rPrDefault><w:rPr>'
+    '<w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:eastAsia="{font}" w:cs="{font}"/>'
+    '<w:sz w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="120"/></w:pPr></w:pPrDefault></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:spacing w:after="240"/></w:pPr><w:rPr><w:b/><w:sz w:val="48"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:keepNext/><w:spacing w:before="240"/><w:outlineLvl w:val="0"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:keepNext/><w:spacing w:before="200"/><w:outlineLvl w:val="1"/></w:pPr>'
+    '<w:rPr><w:b/><w:sz w:val="26"/></w:rPr></w:style>'
+    '<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/>'
+    '<w:rPr><w:color w:val="0563C1"/><w:u w:val="single"/></w:rPr></w:style>'
+    '</w:styles>'
+)
+DOCUMENT_START_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body>'
+)
+DOCUMENT_END_XML = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="720" w:footer="720" w:gutter="0"/>'
+    '</w:sectPr></w:body></w:document>'
+)
+
+
+def reserve_path(folder, prefix, ext):
+    """
+    生成不会覆盖已有文件的路径：prefix_YYYYMMDD.ext，同一天已存在时依次加 _2、_3……
+    以独占方式先创建空文件占位，多个进程/线程同时导出时也不会拿到同一个文件名
+
+    Args:
+        folder (str): 保存目录
+        prefix (str): 文件名前缀
+        ext (str): 扩展名（不含点）
+
+    Returns:
+        str: 已占位的文件路径
+    """
+    os.makedirs(folder, exist_ok=True)
+    stem = f"{prefix}_{datetime.today().strftime('%Y%m%d')}"
+    n = 1
+    while True:
+        name = f"{stem}.{ext}" if n == 1 else f"{stem}_{n}.{ext}"
+        path = os.path.join(folder, name)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            n += 1
+
+
+def iter_passages(since=None, until=None, limit=None):
+    """
+    逐篇读出并解析阅读
+    内容与界面显示一样先去掉 Markdown 标记；无法拆分出正文和题目的旧记录（不符合格式的输出）跳过
+
+    Args:
+        since (str): 起始日期（含），格式 YYYY-MM-DD
+        until (str): 结束日期（不含），格式 YYYY-MM-DD
+        limit (int): 最多导出的篇数
+
+    Yields:
+        dict: {"number", "date", "topic", "title", "paragraphs", "questions"}
+    """
+    number = 0
+    for _, topic, content, timestamp in db.iter_readings(since, until):
+        parsed = parse_passage(clean_markdown(content))
+        if not parsed["paragraphs"] or not parsed["questions"]:
+            continue
+        number += 1
+        yield {
+            "number": number,
+            "date": (timestamp or "")[:10],
+            "topic": topic or "",
+            "title": parsed["title"] or f"Reading {number}",
+            "paragraphs": parsed["paragraphs"],
+            "questions": parsed["questions"],
+        }
+        if limit and number >= limit:
+            return
+
+
+def _subtitle(item):
+    """
+    每篇阅读标题下方的日期和主题
+    """
+    return " · ".join(part for part in (item["date"], item["topic"]) if part)
+
+
+def _xml_text(text):
+    """
+    转义文本并去掉XML非法字符
+    """
+    return escape(INVALID_XML_RE.sub("", text))
+
+
+def _docx_paragraph(text, style=None, italic=False):
+    """
+    生成一个段落的XML，文本中的换行转为段内换行
+    """
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    rpr = "<w:rPr><w:i/></w:rPr>" if italic else ""
+    runs = "<w:br/>".join(
+        f'<w:t xml:space="preserve">{_xml_text(line)}</w:t>' for line in text.split("\n")
+    )
+    return f"<w:p>{ppr}<w:r>{rpr}{runs}</w:r></w:p>"
+
+
+def write_docx(path, titles, items, font_name):
+    """
+    将阅读写入一个 Word 文档
+    document.xml 直接以流的方式写入 zip 包，不在内存中构建整个文档
+
+    Args:
+        path (str): 输出文件路径
+        titles (list): 目录条目 [(序号, 标题, 副标题)]
+        items (iterable): iter_passages() 生成的阅读
+        font_name (str): 正文字体
+    """
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES_XML)
+        zf.writestr("_rels/.rels", PACKAGE_RELS_XML)
+        zf.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS_XML)
+        zf.writestr("word/styles.xml", STYLES_XML.format(font=escape(font_name, {'"': "&quot;"})))
+
+        with zf.open("word/document.xml", "w") as f:
+            def write(xml):
+                f.write(xml.encode("utf-8"))
+
+            write(DOCUMENT_START_XML)
+            write(_docx_paragraph(ANTHOLOGY_TITLE, "Title"))
+            write(_docx_paragraph(f"{len(titles)} passages", italic=True))
+
+            # 目录：每个条目链接到对应阅读标题处的书签
+            write(_docx_paragraph("Contents", "Heading1"))
+            for number, title, subtitle in titles:
+                label = f"{number}. {title}" + (f"  ({subtitle})" if subtitle else "")
+                write(
+                    f'<w:p><w:hyperlink w:anchor="passage_{number}" w:history="1">'
+                    f'<w:r><w:rPr><w:rStyle w:val="Hyperlink"/></w:rPr>'
+                    f'<w:t xml:space="preserve">{_xml_text(label)}</w:t></w:r></w:hyperlink></w:p>'
+                )
+
+            for item in items:
+                number = item["number"]
+                heading = _xml_text(f"{number}. {item['title']}")
+                # 每篇阅读从新的一页开始
+                write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+                write(
+                    f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                    f'<w:bookmarkStart w:id="{number}" w:name="passage_{number}"/>'
+                    f'<w:r><w:t xml:space="preserve">{heading}</w:t></w:r>'
+                    f'<w:bookmarkEnd w:id="{number}"/></w:p>'
+                )
+                if _subtitle(item):
+                    write(_docx_paragraph(_subtitle(item), italic=True))
+                for paragraph in item["paragraphs"]:
+                    write(_docx_paragraph(paragraph))
+                if item["questions"]:
+                    write(_docx_paragraph("Questions", "Heading2"))
+                    for question in item["questions"]:
+                        write(_docx_paragraph(question))
+
+            write(DOCUMENT_END_XML)
+
+
+def write_markdown(path, titles, items):
+    """
+    将阅读写入一个 Markdown 文件
+
+    Args:
+        path (str): 输出文件路径
+        titles (list): 目录条目 [(序号, 标题, 副标题)]
+        items (iterable): iter_passages() 生成的阅读
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {ANTHOLOGY_TITLE}\n\n*{len(titles)} passages*\n\n## Contents\n\n")
+        for number, title, subtitle in titles:
+            f.write(f"{number}. [{title}](#passage-{number})" + (f" — {subtitle}" if subtitle else "") + "\n")
+
+        for item in items:
+            number = item["number"]
+            f.write(f'\n---\n\n<a id="passage-{number}"></a>\n\n## {number}. {item["title"]}\n\n')
+            if _subtitle(item):
+                f.write(f"*{_subtitle(item)}*\n\n")
+            for paragraph in item["paragraphs"]:
+                f.write(paragraph + "\n\n")
+            if item["questions"]:
+                f.write("### Questions\n\n")
+                for question in item["questions"]:
+                    # 选项等后续行用 Markdown 的行内换行保留在同一题中
+                    f.write(question.replace("\n", "  \n") + "\n\n")
+
+
+def export_anthology(save_folder, since=None, until=None, limit=None, fmt="docx",
+                     font_name="Arial", output=None):
+    """
+    导出阅读合集
+    数据库读两遍：第一遍只收集目录标题，第二遍逐篇写出正文
+
+    Args:
+        save_folder (str): 保存目录（未指定 output 时使用）
+        since (str): 起始日期（含），格式 YYYY-MM-DD
+        until (str): 结束日期（不含），格式 YYYY-MM-DD
+        limit (int): 最多导出的篇数
+        fmt (str): docx 或 md
+        font_name (str): Word 文档字体
+        output (str): 输出文件路径，默认在保存目录下自动命名
+
+    Returns:
+        tuple: (文件路径, 篇数)；没有符合条件的阅读时返回 (None, 0)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+
+    titles = [
+        (item["number"], item["title"], _subtitle(item))
+        for item in iter_passages(since, until, limit)
+    ]
+    if not titles:
+        return None, 0
+
+    path = output or reserve_path(save_folder, "English_Reading_Anthology", fmt)
+    items = iter_passages(since, until, len(titles))
+    try:
+        if fmt == "docx":
+            write_docx(path, titles, items, font_name)
+        else:
+            write_markdown(path, titles, items)
+    except Exception:
+        # 不留下写了一半的文件
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path, len(titles)
+
+
+def main(config, argv):
+    """
+    命令行入口：python agent.py export [选项]
+
+    Args:
+        config (dict): 配置字典
+        argv (list): 命令行参数（不含 export）
+    """
+    parser = argparse.ArgumentParser(prog="agent.py export", description="导出阅读合集")
+    parser.add_argument("--since", help="起始日期（含），YYYY-MM-DD")
+    parser.add_argument("--until", help="结束日期（不含），YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, help="最多导出的篇数")
+    parser.add_argument("--format", choices=FORMATS, default="docx", help="导出格式，默认为 docx")
+    parser.add_argument("--output", help="输出文件路径，默认保存到 SAVE_FOLDER")
+    args = parser.parse_args(argv)
+
+    path, count = export_anthology(
+        config["SAVE_FOLDER"], since=args.since, until=args.until, limit=args.limit,
+        fmt=args.format, font_name=config["FONT_NAME"], output=args.output,
+    )
+    if not path:
+        print("没有符合条件的阅读")
+        return
+    print(f"已导出 {count} 篇阅读: {path}")
@@ -0,0 +1,130 @@
+# grading.py - 阅读理解答案批改模块
+# 学习者一次提交一篇文章全部题目的答案，由一次LLM调用批改并返回JSON，
+# 而不是在对话中逐题询问（每题一次请求，每次都重新构建并发送文章上下文）。
+# 批改结果按（文章ID, 规范化答案）的哈希缓存在 answer_grades 表中，相同的答案不再调用LLM；
+# 每次提交都记录到 answer_submissions 表，用于查看学习进度。
+
+import hashlib  # 答案哈希
+import json  # 解析LLM返回的JSON
+import re  # 规范化答案、提取JSON
+
+import db  # 数据库模块
+from llm import generate_code  # 调用LLM
+from prompt import grading_prompt  # 批改提示词
+
+# 每题反馈约两句话，8道题的JSON所需的最大 token 数
+MAX_TOKENS = 1500
+# 单个答案的最大长度（字符），超出部分不参与批改
+MAX_ANSWER_LENGTH = 1000
+# 合法的单题得分
+SCORES = (0, 0.5, 1)
+
+# 模型偶尔会用 ```json 代码块包裹输出
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def normalize_answer(answer):
+    """
+    规范化答案：去掉首尾空白、合并连续空白并忽略大小写，使 "b" 与 " B " 命中同一缓存
+
+    Args:
+        answer (str): 原始答案
+
+    Returns:
+        str: 规范化后的答案
+    """
+    return " ".join(str(answer or "").split())[:MAX_ANSWER_LENGTH].casefold()
+
+
+def answers_hash(passage_id, answers):
+    """
+    计算（文章ID, 答案列表）的缓存键
+
+    Args:
+        passage_id (int): 阅读材料ID
+        answers (list): 规范化后的答案列表
+
+    Returns:
+        str: 十六进制哈希
+    """
+    key = json.dumps([passage_id, answers], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def parse_grades(text, count):
+    """
+    解析LLM返回的批改结果
+
+    Args:
+        text (str): LLM返回的文本
+        count (int): 题目数
+
+    Returns:
+        list: [{"question", "score", "correct", "expected", "feedback"}]，格式不符时返回None
+    """
+    match = JSON_OBJECT_RE.search(text or "")
+    if not match:
+        return None
+    try:
+        items = json.loads(match.group(0))["grades"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(items, list) or len(items) != count:
+        return None
+
+    grades = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return None
+        try:
+            score = float(item.get("score", 0))
+        except (TypeError, ValueError):
+            return None
+        # 不在允许范围内的分数取最接近的合法值
+        score = min(SCORES, key=lambda s: abs(s - score))
+        grades.append({
+            "question": i + 1,
+            "score": score,
+            "correct": score == 1,
+            "expected": str(item.get("expected") or ""),
+            "feedback": str(item.get("feedback") or ""),
+        })
+    return grades
+
+
+def grade_answers(session_id, passage, answers):
+    """
+    批改一篇文章全部题目的答案，并记录本次提交
+
+    Args:
+        session_id (str): 会话ID
+        passage (dict): db.get_passage() 的结果
+        answers (list): 答案列表，与题目一一对应
+
+    Returns:
+        dict: {"passage_id", "score", "total", "grades", "cached"}；
+              LLM调用失败或返回的结果无法解析时返回None（不记录提交）
+    """
+    normalized = [normalize_answer(a) for a in answers]
+    key = answers_hash(passage["id"], normalized)
+    total = len(passage["questions"])
+
+    cached = db.get_answer_grades(key)
+    if cached:
+        grades, score = cached["grades"], cached["score"]
+    else:
+        prompt = grading_prompt(passage["title"], passage["paragraphs"], passage["questions"], normalized)
+        grades = parse_grades(generate_code(prompt, max_tokens=MAX_TOKENS, json_output=True), total)
+        if grades is None:
+            return None
+        score = sum(g["score"] for g in grades)
+        db.save_answer_grades(key, passage["id"], normalized, grades, score)
+
+    db.save_answer_submission(session_id, passage["id"], key, score, total)
+    return {
+        "passage_id": passage["id"],
+        "score": score,
+        "total": total,
+        "grades": grades,
+        "cached": cached is not None,
+    }
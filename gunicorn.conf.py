@@ -0,0 +1,32 @@
+# gunicorn.conf.py - gunicorn 生产配置（Linux / macOS）
+# 用法：gunicorn -c gunicorn.conf.py wsgi:app
+#
+# 请求的大部分时间花在等待LLM返回上，CPU几乎空闲，
+# 因此使用少量进程 + 每进程较多线程（gthread），而不是大量进程
+
+import multiprocessing
+import os
+
+from config import load_config
+
+# 读取 .env，使下面的 WEB_* 变量也可以写在 .env 中
+load_config()
+
+bind = "{}:{}".format(os.getenv("WEB_HOST", "0.0.0.0"), os.getenv("WEB_PORT", "80"))
+
+# 进程数：默认与CPU核数相同，最多4个（各进程共享同一个SQLite文件）
+workers = int(os.getenv("WEB_WORKERS", min(multiprocessing.cpu_count(), 4)))
+# 每个进程的线程数：每个线程在等待LLM时只占用内存，不占用CPU
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "32"))
+
+# 请求中最多调用一次LLM（超时120秒）；task 的多次生成在后台工作线程中执行，不占用请求
+timeout = int(os.getenv("WEB_TIMEOUT", "150"))
+graceful_timeout = 30
+keepalive = 5
+
+# 不预加载应用：每个工作进程各自创建应用和数据库连接
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,186 @@
+# jobs.py - 阅读生成任务队列
+# task 请求最多包含五次完整的生成，不再在HTTP请求中同步执行：
+# /api/chat 把任务写入 generation_jobs 表后立即返回任务ID，由工作线程领取执行，
+# 客户端通过 GET /api/jobs/<id> 轮询结果。
+# 任务保存在SQLite中，客户端断开不影响生成；执行者退出后心跳超时，任务会被其他工作线程重新领取。
+# 同一会话同时只有一个排队/执行中的任务，带相同幂等键（Idempotency-Key）的重复提交返回同一个任务。
+#
+# 工作线程默认随 Web 进程启动（每个进程 JOB_WORKERS 个）；设为 0 时可以单独运行：
+#   python jobs.py
+
+import os  # 进程ID
+import socket  # 主机名，用于标识执行者
+import threading  # 工作线程
+import time  # 休眠
+import uuid  # 执行者的唯一标识
+
+import db  # 数据库模块（generation_jobs 表由迁移创建）
+
+# 没有新任务通知时，每隔多久检查一次队列（秒）；其他进程提交的任务靠轮询发现
+POLL_SECONDS = 2
+# 执行中的任务每隔多久更新一次心跳（秒）
+HEARTBEAT_SECONDS = 30
+# 心跳超过这个时间未更新则视为执行者已退出（秒）
+STALE_SECONDS = 300
+# 每个任务最多被领取的次数（执行者反复退出时不再重试）
+MAX_ATTEMPTS = 3
+# 记录任务结果失败（如数据库被锁）时的重试次数和间隔（秒）
+FINISH_ATTEMPTS = 3
+FINISH_RETRY_SECONDS = 2
+
+# 本进程提交了新任务时唤醒空闲的工作线程
+_wakeup = threading.Event()
+# 本进程的执行者标识，start_workers() 后设置
+_owner = None
+# 本进程正在执行的任务ID，心跳只刷新这些任务
+_running = set()
+_running_lock = threading.Lock()
+
+
+def submit(session_id, message, idempotency_key=None):
+    """
+    提交阅读生成任务
+
+    Args:
+        session_id (str): 会话ID
+        message (str): 用户消息
+        idempotency_key (str): 客户端提供的幂等键，默认为None
+
+    Returns:
+        int: 任务ID（重复提交时为已有任务的ID）
+    """
+    job_id, created = db.enqueue_generation_job(session_id, message, idempotency_key)
+    if created:
+        _wakeup.set()
+    return job_id
+
+
+def get_status(job_id, session_id):
+    """
+    查询任务状态，生成的响应数据只返回给提交任务的会话
+
+    Args:
+        job_id (int): 任务ID
+        session_id (str): 当前会话ID
+
+    Returns:
+        dict: {"job_id", "status", ...}，完成后包含 handle_task 的响应数据；
+              任务不存在或不属于当前会话时返回None
+    """
+    job = db.get_generation_job(job_id)
+    if not job or job["session_id"] != session_id:
+        return None
+    payload = {"job_id": job_id, "status": job["status"]}
+    if job["status"] == "done":
+        payload.update(job["result"])
+    elif job["status"] == "failed":
+        payload["response"] = f"Service error: {job['error']}"
+    return payload
+
+
+def start_workers(app, handler, count):
+    """
+    启动工作线程（每个进程只启动一次）
+
+    Args:
+        app (flask.Flask): 应用实例，任务在其应用上下文中执行
+        handler (callable): 任务处理函数 handler(session_id, message) -> dict
+        count (int): 工作线程数，0 表示不在本进程中执行任务
+    """
+    global _owner
+    if _owner is not None or count <= 0:
+        return
+    _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    for i in range(count):
+        threading.Thread(target=_work, args=(app, handler), name=f"job-worker-{i}", daemon=True).start()
+    threading.Thread(target=_heartbeat, name="job-heartbeat", daemon=True).start()
+
+
+def run_job(app, handler, job):
+    """
+    执行一个已领取的任务并记录结果
+
+    Args:
+        app (flask.Flask): 应用实例
+        handler (callable): 任务处理函数
+        job (dict): db.claim_generation_job() 的返回值
+    """
+    with _running_lock:
+        _running.add(job["id"])
+    try:
+        try:
+            with app.app_context():
+                result = handler(job["session_id"], job["message"])
+        except Exception as e:
+            _finish(job["id"], error=str(e))
+        else:
+            _finish(job["id"], result=result)
+    finally:
+        # 结果未能记录时也不再刷新心跳：任务超时后由其他执行者重新领取或标记为失败，
+        # 不会一直处于 running 状态而阻塞该会话的新提交
+        with _running_lock:
+            _running.discard(job["id"])
+
+
+def _finish(job_id, result=None, error=None):
+    """
+    记录任务结果，失败时重试；结果本身无法保存（如无法序列化）时改为记录错误
+    """
+    for attempt in range(FINISH_ATTEMPTS):
+        try:
+            db.finish_generation_job(job_id, result=result, error=error)
+            return
+        except Exception as e:
+            print(f"记录任务 {job_id} 结果失败（第{attempt + 1}次）:", e)
+            if error is None:
+                result, error = None, f"failed to save result: {e}"
+            time.sleep(FINISH_RETRY_SECONDS)
+
+
+def _work(app, handler):
+    """
+    工作线程：循环领取并执行任务
+    """
+    while True:
+        _wakeup.clear()
+        try:
+            job = db.claim_generation_job(_owner, STALE_SECONDS, MAX_ATTEMPTS)
+        except Exception as e:
+            print("领取生成任务失败:", e)
+            job = None
+        if job is None:
+            _wakeup.wait(POLL_SECONDS)
+            continue
+        try:
+            run_job(app, handler, job)
+        except Exception as e:
+            print(f"执行任务 {job['id']} 失败:", e)
+
+
+def _heartbeat():
+    """
+    心跳线程：定期刷新本进程正在执行的任务，避免被其他进程当作已退出而重新领取
+    """
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _running_lock:
+            job_ids = list(_running)
+        try:
+            db.heartbeat_generation_jobs(_owner, job_ids)
+        except Exception as e:
+            print("更新任务心跳失败:", e)
+
+
+if __name__ == "__main__":
+    # 独立的任务进程：Web 进程设置 JOB_WORKERS=0 时由这里执行所有生成任务
+    from app import create_app, handle_task, init_storage
+
+    app = create_app()
+    init_storage()
+    start_workers(app, handle_task, app.config["JOB_WORKERS"] or 2)
+    print(f"任务执行者 {_owner} 已启动，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
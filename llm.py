@@ -1,25 +1,35 @@
 # llm.py
 import os
 import json
-import requests
-from dotenv import load_dotenv
 
-# 加载 .env 文件中的环境变量（可选）
-load_dotenv()
+import profiling
 
-# DeepSeek API 的 URL
+# requests 只在第一次调用 API 时导入；.env 由入口处的 config.load_config() 加载
+
+# DeepSeek API 的 URL（可通过 DEEPSEEK_API_URL 覆盖，例如指向本地的模拟服务）
 API_URL = "https://api.deepseek.com/v1/chat/completions"
 
-def generate_code(prompt: str) -> str | None:
+# 请求超时时间（秒），长文本生成可能需要较长时间
+TIMEOUT = 120
+
+# 异步客户端，在第一次异步调用时创建并复用连接池
+_async_client = None
+
+
+def _api_url():
+    return os.getenv("DEEPSEEK_API_URL") or API_URL
+
+
+def _build_request(prompt, max_tokens, json_output=False):
     """
-    调用 DeepSeek API 生成 Python 代码
+    构建 API 请求头和请求体
     :param prompt: 用户提示
-    :return: 生成的代码或文本
+    :param max_tokens: 生成文本的最大 token 数
+    :param json_output: 是否要求模型只输出 JSON 对象（提示词中需说明 JSON 格式）
+    :return: (headers, payload)
     """
     # 从环境变量中获取 API 密钥
     api_key = os.getenv("DEEPSEEK_API_KEY")
-    # 调试信息：打印获取到的 API 密钥
-    print("DEBUG inside function: DEEPSEEK_API_KEY =", api_key)
 
     # 严格判断 key 是否存在且不为空
     if api_key is None or api_key.strip() == "":
@@ -40,33 +50,95 @@ def generate_code(prompt: str) -> str | None:
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.7,  # 控制生成文本的创造性
-        "max_tokens": 800    # 生成文本的最大长度
+        "max_tokens": max_tokens  # 生成文本的最大长度
     }
+    if json_output:
+        payload["response_format"] = {"type": "json_object"}
+    return headers, payload
+
 
-    # 调试用：打印将要发送的 JSON 数据
-    print("=== Payload ===")
-    print(json.dumps(payload, ensure_ascii=False, indent=2))
+def _parse_response(status_code, text):
+    """
+    解析 API 响应
+    :param status_code: HTTP 状态码
+    :param text: 响应正文
+    :return: 生成的文本，失败时返回 None
+    """
+    # 检查响应状态码是否为 200 (成功)
+    if status_code != 200:
+        # 如果状态码不为 200，则打印错误信息和响应内容
+        print(f"Error: {status_code}")
+        print(text)
+        return None
+
+    try:
+        # 解析 JSON 响应并返回生成的内容
+        return json.loads(text)["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
+        # 如果解析失败，则打印错误信息并返回 None
+        print("解析返回结果失败:", e)
+        return None
+
+
+@profiling.timed("llm")
+def generate_code(prompt: str, max_tokens: int = 800, json_output: bool = False) -> str | None:
+    """
+    调用 DeepSeek API 生成 Python 代码
+    :param prompt: 用户提示
+    :param max_tokens: 生成文本的最大 token 数
+    :param json_output: 是否要求模型只输出 JSON 对象
+    :return: 生成的代码或文本
+    """
+    import requests
+
+    headers, payload = _build_request(prompt, max_tokens, json_output)
 
     try:
         # 发送 POST 请求到 API，并将超时时间设置为 120 秒以处理长时间的生成任务
-        resp = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+        resp = requests.post(_api_url(), headers=headers, json=payload, timeout=TIMEOUT)
     except requests.exceptions.RequestException as e:
         # 如果请求失败，则打印错误信息并返回 None
         print("请求 API 失败:", e)
         return None
 
-    # 检查响应状态码是否为 200 (成功)
-    if resp.status_code != 200:
-        # 如果状态码不为 200，则打印错误信息和响应内容
-        print(f"Error: {resp.status_code}")
-        print(resp.text)
-        return None
+    return _parse_response(resp.status_code, resp.text)
+
 
+async def agenerate_code(prompt: str, max_tokens: int = 800) -> str | None:
+    """
+    generate_code 的异步版本
+    等待 API 返回期间不占用线程，一个事件循环可以同时挂起大量请求
+    :param prompt: 用户提示
+    :param max_tokens: 生成文本的最大 token 数
+    :return: 生成的代码或文本
+    """
+    import httpx
+
+    global _async_client
+    if _async_client is None:
+        # 不限制连接数：并发上限由服务器的请求数决定
+        _async_client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+
+    headers, payload = _build_request(prompt, max_tokens)
     try:
-        # 解析 JSON 响应并返回生成的内容
-        return resp.json()["choices"][0]["message"]["content"]
-    except (KeyError, IndexError, json.JSONDecodeError) as e:
-        # 如果解析失败，则打印错误信息并返回 None
-        print("解析返回结果失败:", e)
+        with profiling.stage("llm"):
+            resp = await _async_client.post(_api_url(), headers=headers, json=payload)
+    except httpx.HTTPError as e:
+        # 如果请求失败，则打印错误信息并返回 None
+        print("请求 API 失败:", e)
         return None
 
+    return _parse_response(resp.status_code, resp.text)
+
+
+async def aclose():
+    """
+    关闭异步客户端（应用关闭时调用）
+    """
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,148 @@
+# passage.py - 阅读材料解析模块
+# 将LLM生成的阅读材料解析为标题、段落和题目三部分的结构化数据
+# LLM 经常输出 Markdown（"### Questions"、"**1.**"），解析前先用 clean_markdown() 去掉，
+# 题号和题目区标题的识别也容忍行首残留的 # / *
+
+import re  # 正则表达式模块，用于识别分隔线和题号
+
+# 分隔线：由三个及以上的 - 组成的独立一行
+SEPARATOR_RE = re.compile(r"^\s*-{3,}\s*$")
+# 题目区标题，例如 "Questions"、"Comprehension Questions:"、"### Questions"
+QUESTIONS_HEADING_RE = re.compile(r"^[\s#*]*(comprehension\s+)?questions?\s*:?[\s*]*$", re.IGNORECASE)
+# 题号开头的行，例如 "1." "2)" "Q3." "Question 4:" "**1.**"
+QUESTION_START_RE = re.compile(r"^[\s#*]*(?:q(?:uestion)?\s*)?\d+\s*[.)、:：]", re.IGNORECASE)
+# Markdown 标记符号
+MARKDOWN_RE = re.compile(r"[#*]")
+
+
+def clean_markdown(text):
+    """
+    清理Markdown格式文本
+
+    Args:
+        text (str): 输入的文本
+
+    Returns:
+        str: 清理后的文本，移除了#和*符号
+    """
+    if not text:
+        return ""
+    return MARKDOWN_RE.sub("", text)
+# 各部分的标签行，例如 "Title:"、"Reading Passage"
+LABEL_RE = re.compile(r"^\s*(title|reading\s+passage|passage)\s*:?\s*", re.IGNORECASE)
+
+
+def _strip_label(line):
+    """
+    去掉行首的标签（如 "Title:"）
+
+    Args:
+        line (str): 原始行
+
+    Returns:
+        str: 去掉标签后的内容
+    """
+    return LABEL_RE.sub("", line, count=1).strip()
+
+
+def _split_paragraphs(text):
+    """
+    将正文切分为段落
+    优先按空行切分；如果正文中没有空行，则每一行视为一个段落
+
+    Args:
+        text (str): 正文文本
+
+    Returns:
+        list: 段落列表
+    """
+    blocks = [b.strip() for b in re.split(r"\n\s*\n", text) if b.strip()]
+    if len(blocks) <= 1:
+        blocks = [line.strip() for line in text.split("\n") if line.strip()]
+
+    paragraphs = []
+    for block in blocks:
+        # 跳过单独的 "Reading Passage" 标签行
+        if not _strip_label(block):
+            continue
+        paragraphs.append(" ".join(line.strip() for line in block.split("\n") if line.strip()))
+    return paragraphs
+
+
+def _split_questions(text):
+    """
+    将题目区切分为独立的题目
+    题号开头的行开始一道新题，后续行（如选项）并入当前题目
+
+    Args:
+        text (str): 题目区文本
+
+    Returns:
+        list: 题目列表
+    """
+    questions = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or QUESTIONS_HEADING_RE.match(line):
+            continue
+        if QUESTION_START_RE.match(line) or not questions:
+            questions.append(line)
+        else:
+            questions[-1] += "\n" + line
+    return questions
+
+
+def parse_passage(text):
+    """
+    解析LLM生成的阅读材料
+    支持提示词要求的 "Title --- Reading Passage --- Questions" 格式，
+    没有分隔线时退回到按 "Questions" 标题和题号识别
+
+    Args:
+        text (str): 阅读材料全文
+
+    Returns:
+        dict: {"title": 标题, "paragraphs": 段落列表, "questions": 题目列表}
+    """
+    lines = (text or "").strip().split("\n")
+
+    # 按分隔线切分为若干部分
+    sections = [[]]
+    for line in lines:
+        if SEPARATOR_RE.match(line):
+            sections.append([])
+        else:
+            sections[-1].append(line)
+    sections = ["\n".join(s).strip() for s in sections if "\n".join(s).strip()]
+
+    if len(sections) >= 3:
+        head, body, tail = sections[0], "\n\n".join(sections[1:-1]), sections[-1]
+        title = _strip_label(head.split("\n")[0])
+        # 标题部分除首行外的内容并入正文
+        rest = "\n".join(head.split("\n")[1:]).strip()
+        if rest:
+            body = rest + "\n\n" + body
+    else:
+        full_lines = "\n".join(sections).split("\n")
+        # sections 已去掉首尾空白，第一行即为标题
+        title = _strip_label(full_lines[0])
+        remainder = full_lines[1:]
+        # 找到题目区的起点：标题行 "Questions" 或第一个题号行
+        split_at = len(remainder)
+        for i, line in enumerate(remainder):
+            if QUESTIONS_HEADING_RE.match(line):
+                split_at = i
+                break
+        else:
+            for i, line in enumerate(remainder):
+                if QUESTION_START_RE.match(line):
+                    split_at = i
+                    break
+        body = "\n".join(remainder[:split_at])
+        tail = "\n".join(remainder[split_at:])
+
+    return {
+        "title": title,
+        "paragraphs": _split_paragraphs(body),
+        "questions": _split_questions(tail),
+    }
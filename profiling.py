@@ -0,0 +1,362 @@
+# profiling.py - 线上请求的按需性能分析
+# 默认关闭。开启后按比例抽样（PROFILE_SAMPLE_RATE），或由带管理员令牌的请求头
+# X-Profile-Token 强制分析单个请求。被分析的请求：
+#   - 在同步路径（Flask）上用 cProfile 记录完整调用栈；
+#   - 分别累计 llm（调用模型）、db（SQLite）和 docx（生成Word文档）三个阶段的耗时；
+#   - 结果写入 PROFILE_DIR 下的 .prof 文件（可用 snakeviz / pstats 查看）和同名 .json 摘要，
+#     只保留最近 PROFILE_KEEP 个。
+# GET /api/profiles/slowest 从摘要中列出最近最慢的请求及其最耗时的调用栈。
+# 未被分析的请求只多一次随机数判断，各阶段计时在没有分析记录时直接跳过。
+
+import contextvars  # 当前请求的分析记录（线程和协程各自独立）
+import functools  # 装饰器
+import glob  # 列出分析文件
+import hmac  # 比较管理员令牌
+import json  # 摘要文件
+import os  # 文件操作
+import random  # 抽样
+import sqlite3  # 计时的数据库连接
+import threading  # cProfile 的进程级锁
+import time  # 计时
+import uuid  # 请求ID
+from datetime import datetime  # 摘要中的开始时间
+
+# 强制分析的请求头
+TOKEN_HEADER = "X-Profile-Token"
+
+# 运行配置，由 configure() 设置
+SAMPLE_RATE = 0.0
+ADMIN_TOKEN = ""
+PROFILE_DIR = "profiles"
+KEEP = 100
+
+# 摘要中保留的调用栈数量和深度
+TOP_STACKS = 5
+STACK_DEPTH = 8
+
+# 当前请求的分析记录，None 表示未被分析
+_current = contextvars.ContextVar("profile_record", default=None)
+# 正在计时的阶段，嵌套的阶段不重复计时
+_active_stage = contextvars.ContextVar("profile_stage", default=None)
+# 同一进程中同时只能有一个 cProfile 在运行（Python 3.12 起基于 sys.monitoring，作用于整个解释器），
+# 其他同时被分析的请求只记录阶段耗时
+_cprofile_lock = threading.Lock()
+
+
+def configure(config):
+    """
+    应用配置
+
+    Args:
+        config (dict): 配置字典（PROFILE_SAMPLE_RATE / PROFILE_ADMIN_TOKEN / PROFILE_DIR / PROFILE_KEEP）
+    """
+    global SAMPLE_RATE, ADMIN_TOKEN, PROFILE_DIR, KEEP
+    SAMPLE_RATE = config["PROFILE_SAMPLE_RATE"]
+    ADMIN_TOKEN = config["PROFILE_ADMIN_TOKEN"]
+    PROFILE_DIR = config["PROFILE_DIR"]
+    KEEP = config["PROFILE_KEEP"]
+
+
+def is_admin(token):
+    """
+    检查管理员令牌（未配置令牌时总是返回False）
+
+    Args:
+        token (str): 请求头中的令牌
+
+    Returns:
+        bool: 令牌有效返回True
+    """
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def start_request(method, path, token=None, use_cprofile=True):
+    """
+    决定是否分析当前请求，需要分析时开始记录
+
+    Args:
+        method (str): 请求方法
+        path (str): 请求路径
+        token (str): X-Profile-Token 请求头
+        use_cprofile (bool): 是否记录调用栈（异步路径上多个请求交替执行，只记录阶段耗时；
+            已有其他请求在用 cProfile 或启动失败时同样只记录阶段耗时）
+
+    Returns:
+        contextvars.Token: 传给 finish_request()；不分析时返回None
+    """
+    if not is_admin(token) and not (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE):
+        return None
+
+    record = {
+        "id": uuid.uuid4().hex[:12],
+        "method": method,
+        "path": path,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "start": time.perf_counter(),
+        "stages": {"llm": 0.0, "db": 0.0, "docx": 0.0},
+        "profiler": _start_cprofile() if use_cprofile else None,
+    }
+    return _current.set(record)
+
+
+def _start_cprofile():
+    """
+    获取 cProfile 锁并开始记录调用栈
+
+    Returns:
+        cProfile.Profile: 已启动的分析器；锁被占用或启动失败时返回None
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    try:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    except Exception as e:
+        # 例如其他分析工具（调试器、覆盖率）已占用 sys.monitoring
+        _cprofile_lock.release()
+        print("启动 cProfile 失败，只记录阶段耗时:", e)
+        return None
+    return profiler
+
+
+def finish_request(context_token, status):
+    """
+    结束记录并写入分析文件
+
+    Args:
+        context_token (contextvars.Token): start_request() 的返回值
+        status (int): 响应状态码
+    """
+    record = _current.get()
+    _current.reset(context_token)
+    if record is None:
+        return
+    duration = time.perf_counter() - record["start"]
+    profiler = record["profiler"]
+    if profiler:
+        try:
+            profiler.disable()
+        except Exception as e:
+            print("停止 cProfile 失败:", e)
+            record["profiler"] = None
+        finally:
+            _cprofile_lock.release()
+
+    # 性能分析不能让请求失败
+    try:
+        _write(record, status, duration)
+    except Exception as e:
+        print("写入性能分析文件失败:", e)
+
+
+def stage(name):
+    """
+    阶段计时（上下文管理器）：with profiling.stage("llm"): ...
+    当前请求未被分析或已在其他阶段内时不计时
+    """
+    return _Stage(name)
+
+
+class _Stage:
+    """
+    stage() 返回的上下文管理器
+    """
+
+    __slots__ = ("name", "record", "token", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.record = None
+
+    def __enter__(self):
+        record = _current.get()
+        if record is not None and _active_stage.get() is None:
+            self.record = record
+            self.token = _active_stage.set(self.name)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.record is not None:
+            self.record["stages"][self.name] += time.perf_counter() - self.start
+            _active_stage.reset(self.token)
+        return False
+
+
+def timed(name):
+    """
+    阶段计时装饰器（用于同步函数）
+
+    Args:
+        name (str): 阶段名称
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """
+    SQL 执行和取结果计入 db 阶段的游标
+    """
+
+    def execute(self, *args):
+        with stage("db"):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with stage("db"):
+            return super().executemany(*args)
+
+    def fetchone(self):
+        with stage("db"):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with stage("db"):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with stage("db"):
+            return super().fetchall()
+
+
+class _TimedConnection(sqlite3.Connection):
+    """
+    创建 _TimedCursor 的连接，提交也计入 db 阶段
+    """
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def commit(self):
+        with stage("db"):
+            return super().commit()
+
+
+def connection_factory():
+    """
+    db.connect() 使用的连接类：当前请求被分析时返回计时的连接类
+
+    Returns:
+        type: sqlite3.Connection 或其计时子类
+    """
+    return sqlite3.Connection if _current.get() is None else _TimedConnection
+
+
+def _label(func):
+    """
+    pstats 函数键 (文件, 行号, 函数名) 转为简短的文字
+    """
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def top_stacks(stats, limit=TOP_STACKS, depth=STACK_DEPTH):
+    """
+    找出自身耗时最多的函数，并沿耗时最多的调用者向上还原调用栈
+
+    Args:
+        stats (pstats.Stats): 分析结果
+        limit (int): 返回的调用栈数量
+        depth (int): 每个调用栈的最大深度
+
+    Returns:
+        list: [{"self_ms", "calls", "stack": [外层 -> 内层]}]
+    """
+    entries = stats.stats
+    hottest = sorted(entries.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    result = []
+    for func, (_, calls, tottime, _, callers) in hottest:
+        stack = [func]
+        while callers and len(stack) < depth:
+            # 调用者的值为 (原始调用次数, 调用次数, 自身耗时, 累计耗时)
+            caller = max(callers, key=lambda c: callers[c][3])
+            if caller in stack:
+                break
+            stack.append(caller)
+            callers = entries.get(caller, (0, 0, 0, 0, {}))[4]
+        result.append({
+            "self_ms": round(tottime * 1000, 2),
+            "calls": calls,
+            "stack": [_label(f) for f in reversed(stack)],
+        })
+    return result
+
+
+def _write(record, status, duration):
+    """
+    写入 .prof 和 .json 文件，并删除超出保留数量的旧文件
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{record['id']}")
+
+    stages = {name: round(seconds * 1000, 2) for name, seconds in record["stages"].items()}
+    summary = {
+        "id": record["id"],
+        "method": record["method"],
+        "path": record["path"],
+        "status": status,
+        "started": record["started"],
+        "duration_ms": round(duration * 1000, 2),
+        "stages_ms": stages,
+        "other_ms": round(duration * 1000 - sum(stages.values()), 2),
+        "profile_file": None,
+        "top_stacks": [],
+    }
+    if record["profiler"]:
+        import pstats
+        stats = pstats.Stats(record["profiler"])
+        stats.dump_stats(base + ".prof")
+        summary["profile_file"] = os.path.basename(base + ".prof")
+        summary["top_stacks"] = top_stacks(stats)
+
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False)
+    _rotate()
+
+
+def _rotate():
+    """
+    只保留最近 KEEP 个请求的分析文件（多个工作进程同时删除时忽略已不存在的文件）
+    """
+    summaries = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")))
+    for path in summaries[:max(len(summaries) - KEEP, 0)]:
+        for old in (path, path[:-len(".json")] + ".prof"):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+
+def slowest(limit=20):
+    """
+    列出最近被分析的请求中最慢的若干个
+    从 PROFILE_DIR 读取摘要，因此包含所有工作进程的结果
+
+    Args:
+        limit (int): 返回的最大数量
+
+    Returns:
+        list: 摘要列表，按耗时从高到低排列
+    """
+    summaries = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            # 正在写入或刚被轮换删除
+            continue
+    summaries.sort(key=lambda s: s["duration_ms"], reverse=True)
+    return summaries[:limit]
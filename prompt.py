@@ -44,4 +44,78 @@ Reading Passage
 Questions
 
 This is reading number {step + 1}.        # 这是第{step + 1}篇阅读材料
-"""
\ No newline at end of file
+"""
+
+
+def reading_prompt(domain: str, subtopic: str, style: str) -> str:
+    """
+    生成阅读材料的提示词，由采样器（sampler.py）指定领域、子话题和文体
+    
+    Args:
+        domain (str): 领域，例如 "Finance & Economics"
+        subtopic (str): 子话题
+        style (str): 文体
+        
+    Returns:
+        str: 格式化的提示词字符串
+    """
+    return f"""
+You are an advanced English learning assistant.
+
+Task:
+Generate a high-quality English reading passage suitable for CET-6 level learners.
+
+Requirements:
+1. Domain: {domain}
+   Focus on this specific subtopic: {subtopic}
+2. Length: 600–900 words
+3. Style: formal, logical, well-structured; write it as a {style}
+4. After the passage, provide 5–8 English comprehension questions
+5. DO NOT provide answers
+6. Content must be original and not repeated
+
+Output format:
+Title
+---
+Reading Passage
+---
+Questions
+"""
+
+
+def grading_prompt(title: str, paragraphs: list, questions: list, answers: list) -> str:
+    """
+    生成批量批改阅读理解答案的提示词，一次请求批改全部题目并返回JSON
+    
+    Args:
+        title (str): 文章标题
+        paragraphs (list): 段落列表
+        questions (list): 题目列表
+        answers (list): 学习者的答案，与题目一一对应
+        
+    Returns:
+        str: 格式化的提示词字符串
+    """
+    passage = "\n\n".join(f"[{i + 1}] {p}" for i, p in enumerate(paragraphs))
+    items = "\n\n".join(
+        f"Question {i + 1}: {q}\nLearner's answer: {a or '(no answer)'}"
+        for i, (q, a) in enumerate(zip(questions, answers))
+    )
+    return f"""
+You are grading a CET-6 level English reading comprehension exercise.
+
+Passage title: {title}
+
+Passage (paragraphs are numbered):
+{passage}
+
+Questions and the learner's answers:
+{items}
+
+For each question, decide the best answer from the passage and grade the learner's answer:
+- score 1 if correct, 0.5 if partially correct, 0 if wrong or missing
+- feedback: one or two sentences in English explaining why, citing the paragraph number
+
+Return ONLY a JSON object in exactly this format, with one entry per question in order:
+{{"grades": [{{"question": 1, "score": 1, "expected": "the correct answer", "feedback": "..."}}]}}
+"""
@@ -0,0 +1,190 @@
+# retrieval.py - 段落检索模块
+# 基于BM25为阅读材料的段落建立轻量索引，按用户问题挑选最相关的段落
+
+import math  # 数学函数，用于计算IDF
+import re  # 正则表达式模块，用于分词和识别段落引用
+from collections import Counter  # 词频统计
+
+# 英文单词（含连字符和撇号）
+TOKEN_RE = re.compile(r"[a-z][a-z'\-]*")
+
+# 常见英文停用词，不参与打分
+STOPWORDS = frozenset("""
+a an the and or but if then of to in on at by for with from as is are was were be been being
+this that these those it its they them their there here what which who whom whose when where why how
+do does did doing have has had having not no so such than too very can could should would will shall
+may might must about into over under again further once all any both each few more most other some
+own same only just also i me my we our you your he him his she her
+paragraph para passage article text
+""".split())
+
+# 中文数字到阿拉伯数字的映射，用于解析 "第五段"
+CN_NUMBERS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 段落引用，例如 "paragraph 5"、"para. 2"、"第5段"、"第五段"
+PARAGRAPH_REF_RE = re.compile(
+    r"(?:paragraph|para\.?)\s*(\d+)|第\s*([\d一二三四五六七八九十]+)\s*(?:段|自然段)",
+    re.IGNORECASE,
+)
+# "最后一段" / "last paragraph"
+LAST_PARAGRAPH_RE = re.compile(r"最后一段|last\s+paragraph", re.IGNORECASE)
+
+
+def tokenize(text):
+    """
+    英文分词：转小写、去停用词，并做最简单的复数归一
+
+    Args:
+        text (str): 输入文本
+
+    Returns:
+        list: 词条列表
+    """
+    tokens = []
+    for tok in TOKEN_RE.findall((text or "").lower()):
+        tok = tok.strip("'-")
+        if len(tok) < 2 or tok in STOPWORDS:
+            continue
+        # 简单的复数归一：policies -> policy, markets -> market
+        if tok.endswith("ies") and len(tok) > 4:
+            tok = tok[:-3] + "y"
+        elif tok.endswith("s") and not tok.endswith("ss") and len(tok) > 3:
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def _cn_to_int(s):
+    """
+    将 "5"、"五"、"十二" 这类数字转换为整数
+
+    Args:
+        s (str): 数字字符串
+
+    Returns:
+        int: 对应的整数，无法解析时返回0
+    """
+    if s.isdigit():
+        return int(s)
+    if s == "十":
+        return 10
+    if s.startswith("十"):
+        return 10 + CN_NUMBERS.get(s[1:], 0)
+    if s.endswith("十"):
+        return CN_NUMBERS.get(s[:-1], 0) * 10
+    if "十" in s:
+        tens, ones = s.split("十", 1)
+        return CN_NUMBERS.get(tens, 0) * 10 + CN_NUMBERS.get(ones, 0)
+    return CN_NUMBERS.get(s, 0)
+
+
+def find_paragraph_refs(query, total):
+    """
+    找出问题中显式引用的段落序号（如 "第五段"、"paragraph 2"）
+
+    Args:
+        query (str): 用户问题
+        total (int): 段落总数
+
+    Returns:
+        list: 被引用段落的下标（从0开始），按出现顺序去重
+    """
+    refs = []
+    for m in PARAGRAPH_REF_RE.finditer(query or ""):
+        n = _cn_to_int(m.group(1) or m.group(2))
+        if 1 <= n <= total and n - 1 not in refs:
+            refs.append(n - 1)
+    if total and LAST_PARAGRAPH_RE.search(query or "") and total - 1 not in refs:
+        refs.append(total - 1)
+    return refs
+
+
+class BM25Index:
+    """
+    BM25 倒排索引
+    文档数量很少（一篇文章的段落），因此整体常驻内存
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Args:
+            documents (list): 文档（段落）文本列表
+            k1 (float): 词频饱和参数
+            b (float): 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lens = [sum(freqs.values()) for freqs in self.doc_freqs]
+        self.avg_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+
+        # 统计每个词出现在多少个文档中，并计算IDF
+        df = Counter()
+        for freqs in self.doc_freqs:
+            df.update(freqs.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - f + 0.5) / (f + 0.5)) for term, f in df.items()}
+
+    def score(self, query_tokens, index):
+        """
+        计算查询对单个文档的BM25得分
+
+        Args:
+            query_tokens (list): 查询词条
+            index (int): 文档下标
+
+        Returns:
+            float: BM25得分
+        """
+        freqs = self.doc_freqs[index]
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens[index] / (self.avg_len or 1))
+        total = 0.0
+        for term in query_tokens:
+            tf = freqs.get(term)
+            if tf:
+                total += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return total
+
+    def search(self, query, top_k=3):
+        """
+        检索与查询最相关的文档
+
+        Args:
+            query (str): 查询文本
+            top_k (int): 返回的最大文档数
+
+        Returns:
+            list: [(文档下标, 得分)]，按得分从高到低排列，只包含得分大于0的文档
+        """
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            return []
+        scored = [(i, self.score(query_tokens, i)) for i in range(len(self.doc_freqs))]
+        scored = [item for item in scored if item[1] > 0]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:top_k]
+
+
+def select_paragraphs(index, paragraphs, query, top_k=3):
+    """
+    为用户问题挑选相关段落
+    显式引用的段落优先，其余名额按BM25得分补齐；都没有命中时返回首段作为概览
+
+    Args:
+        index (BM25Index): 段落索引
+        paragraphs (list): 段落文本列表
+        query (str): 用户问题
+        top_k (int): 返回的最大段落数
+
+    Returns:
+        list: 选中段落的下标，按原文顺序排列
+    """
+    chosen = find_paragraph_refs(query, len(paragraphs))[:top_k]
+    for i, _ in index.search(query, top_k=top_k):
+        if len(chosen) >= top_k:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    if not chosen and paragraphs:
+        chosen = [0]
+    return sorted(chosen)
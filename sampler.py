@@ -0,0 +1,165 @@
+# sampler.py - 选题采样模块
+# 每次生成前选定领域、子话题和文体并写入提示词，
+# 按已经生成过的内容加权：越少出现的组合越容易被选中，减少雷同输出和去重重试
+
+import random  # 加权随机选择
+from collections import Counter  # 计数
+
+import db  # 数据库模块
+
+# 领域 -> 子话题（领域与原提示词中的四个大类一致）
+DOMAINS = {
+    "Finance & Economics": [
+        "central bank independence and interest rates",
+        "inflation and the cost of living",
+        "behavioral economics and consumer decisions",
+        "global supply chains and trade",
+        "the gig economy and labor markets",
+        "sovereign debt and fiscal policy",
+        "fintech, digital payments and banking",
+        "income inequality and social mobility",
+        "housing markets and urbanization",
+        "sustainable finance and carbon pricing",
+    ],
+    "Academic Research": [
+        "the replication crisis in psychology",
+        "peer review and scientific publishing",
+        "interdisciplinary research and its challenges",
+        "research ethics and informed consent",
+        "the history and philosophy of the scientific method",
+        "linguistics and how children acquire language",
+        "archaeology and reconstructing ancient societies",
+        "cognitive science of memory and learning",
+        "sociology of education and standardized testing",
+        "open data and reproducible research",
+    ],
+    "Science & Technology": [
+        "artificial intelligence and the future of work",
+        "gene editing and bioethics",
+        "renewable energy storage",
+        "space exploration and commercial spaceflight",
+        "climate modelling and extreme weather",
+        "quantum computing explained",
+        "antibiotic resistance",
+        "privacy and surveillance in the digital age",
+        "neuroscience of sleep",
+        "biodiversity loss and conservation technology",
+    ],
+    "Famous Speeches or Intellectual Essays": [
+        "the value of a liberal arts education",
+        "civic duty and public service",
+        "freedom of speech and its limits",
+        "the meaning of work and vocation",
+        "science, doubt and intellectual humility",
+        "reading, solitude and the examined life",
+        "leadership in times of crisis",
+        "technology and what it means to be human",
+        "tradition versus innovation in culture",
+        "global citizenship and cultural exchange",
+    ],
+}
+
+# 文体（修辞方式）
+STYLES = [
+    "argumentative essay that defends a clear thesis",
+    "expository article that explains a concept step by step",
+    "problem-solution analysis",
+    "compare-and-contrast discussion",
+    "cause-and-effect analysis",
+    "historical narrative leading to a present-day debate",
+    "formal speech addressed to a university audience",
+    "opinion column that weighs competing viewpoints",
+]
+
+# 只参考最近若干篇的分布，使较早的历史逐渐失去影响
+HISTORY_WINDOW = 60
+
+
+def recent_counts(window=HISTORY_WINDOW):
+    """
+    统计最近生成的阅读中各领域、子话题、文体出现的次数
+    领域取自 learning_state.topic，子话题和文体取自 generation_log
+
+    Args:
+        window (int): 参考的最近篇数
+
+    Returns:
+        tuple: (领域计数, 子话题计数, 文体计数)，均为 Counter
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT topic FROM learning_state ORDER BY id DESC LIMIT ?",
+        (window,)
+    )
+    domains = Counter(row[0] for row in c.fetchall())
+    c.execute(
+        "SELECT subtopic, style FROM generation_log WHERE state_id IS NOT NULL ORDER BY id DESC LIMIT ?",
+        (window,)
+    )
+    rows = c.fetchall()
+    conn.close()
+    return domains, Counter(r[0] for r in rows), Counter(r[1] for r in rows)
+
+
+def _weighted_choice(options, counts, rng, exclude=()):
+    """
+    按 1 / (1 + 出现次数)² 加权随机选择，出现过的选项权重迅速下降
+
+    Args:
+        options (list): 候选项
+        counts (Counter): 各候选项的出现次数
+        rng (random.Random): 随机数生成器
+        exclude (iterable): 本次生成中已经尝试过、需要避开的候选项
+
+    Returns:
+        str: 选中的候选项
+    """
+    candidates = [o for o in options if o not in exclude] or list(options)
+    weights = [1.0 / (1 + counts.get(o, 0)) ** 2 for o in candidates]
+    return rng.choices(candidates, weights=weights, k=1)[0]
+
+
+def sample(counts, rng=random, exclude=()):
+    """
+    选定一次生成的领域、子话题和文体
+
+    Args:
+        counts (tuple): recent_counts() 的结果
+        rng (random.Random): 随机数生成器，默认为 random 模块
+        exclude (iterable): 本次生成中已经尝试过的子话题
+
+    Returns:
+        dict: {"domain", "subtopic", "style"}
+    """
+    domain_counts, subtopic_counts, style_counts = counts
+    domain = _weighted_choice(list(DOMAINS), domain_counts, rng)
+    subtopic = _weighted_choice(DOMAINS[domain], subtopic_counts, rng, exclude)
+    style = _weighted_choice(STYLES, style_counts, rng)
+    return {"domain": domain, "subtopic": subtopic, "style": style}
+
+
+def generation_summary():
+    """
+    汇总每次生成的LLM调用次数和被拒原因，用于衡量采样器减少的重试
+
+    Returns:
+        dict: generations, succeeded, llm_calls, avg_calls_per_success, duplicates, rejected, empty
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT COUNT(*), COUNT(state_id), COALESCE(SUM(attempts), 0), COALESCE(SUM(duplicates), 0), "
+        "COALESCE(SUM(rejected), 0), COALESCE(SUM(empty), 0) FROM generation_log"
+    )
+    generations, succeeded, calls, duplicates, rejected, empty = c.fetchone()
+    conn.close()
+    return {
+        "generations": generations,
+        "succeeded": succeeded,
+        "llm_calls": calls,
+        "avg_calls_per_success": round(calls / succeeded, 3) if succeeded else None,
+        "duplicates": duplicates,
+        "rejected": rejected,
+        "empty": empty,
+    }
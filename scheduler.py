@@ -0,0 +1,313 @@
+# scheduler.py - 低峰期预生成调度器
+# 每天在配置的低峰时间窗口内（加随机延迟）预先生成阅读，存入 prepared_reading 表，
+# 高峰期用户输入 task 时直接领取，无需等待LLM
+#
+# 用法：
+#   python agent.py schedule          # 常驻运行
+#   python agent.py schedule --once   # 补跑到期的任务后退出（适合系统计划任务 / cron）
+
+import os  # 进程ID
+import random  # 随机延迟
+import socket  # 主机名，用于标识锁的持有者
+import threading  # 生成期间的锁心跳线程
+import time  # 休眠
+import uuid  # 锁持有者的唯一标识
+from datetime import datetime, timedelta  # 日期时间计算
+
+import agent  # 生成流程（generate_reading / save_prepared_reading）
+import db  # 数据库模块（scheduler_run / scheduler_lock 表由迁移创建）
+
+# 锁的心跳超过这个时间未更新则视为持有者已退出（秒）
+LOCK_STALE_SECONDS = 600
+# 休眠和生成期间每隔多久更新一次心跳（秒）；一篇阅读最多 5 次 × 120 秒的LLM调用，
+# 生成期间由后台线程刷新心跳，否则锁可能在生成中途过期而被其他调度器抢占
+HEARTBEAT_SECONDS = 60
+# 锁名称：每个数据库只允许一个调度器
+LOCK_NAME = "scheduler"
+# 等待桌面通知发送完成的最长时间（秒）：--once 模式下生成结束后进程立即退出
+NOTIFY_WAIT_SECONDS = 10
+
+
+def acquire_lock(owner):
+    """
+    获取调度器锁，或刷新自己持有的锁的心跳
+
+    Args:
+        owner (str): 锁持有者标识
+
+    Returns:
+        bool: 获取成功返回True；锁被其他存活的调度器持有时返回False
+    """
+    conn = db.connect(isolation_level=None)
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    c.execute(
+        "SELECT owner FROM scheduler_lock WHERE name = ? AND heartbeat > datetime('now', ?)",
+        (LOCK_NAME, f"-{LOCK_STALE_SECONDS} seconds")
+    )
+    row = c.fetchone()
+    if row and row[0] != owner:
+        c.execute("ROLLBACK")
+        conn.close()
+        return False
+    c.execute(
+        "INSERT OR REPLACE INTO scheduler_lock (name, owner, heartbeat) VALUES (?, ?, datetime('now'))",
+        (LOCK_NAME, owner)
+    )
+    c.execute("COMMIT")
+    conn.close()
+    return True
+
+
+def release_lock(owner):
+    """
+    释放调度器锁（只释放自己持有的锁）
+
+    Args:
+        owner (str): 锁持有者标识
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute("DELETE FROM scheduler_lock WHERE name = ? AND owner = ?", (LOCK_NAME, owner))
+    conn.commit()
+    conn.close()
+
+
+def get_run_status(run_date):
+    """
+    查询指定日期的运行状态
+
+    Args:
+        run_date (str): 日期，格式 YYYY-MM-DD
+
+    Returns:
+        str: 运行状态，没有记录时返回None
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute("SELECT status FROM scheduler_run WHERE run_date = ?", (run_date,))
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def record_run(run_date, status, generated=0):
+    """
+    记录一次运行的状态
+
+    Args:
+        run_date (str): 日期，格式 YYYY-MM-DD
+        status (str): running / done / failed
+        generated (int): 本次生成的篇数
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    if status == "running":
+        c.execute(
+            "INSERT OR REPLACE INTO scheduler_run (run_date, status, generated, started_at) "
+            "VALUES (?, ?, 0, datetime('now'))",
+            (run_date, status)
+        )
+    else:
+        c.execute(
+            "UPDATE scheduler_run SET status = ?, generated = ?, finished_at = datetime('now') WHERE run_date = ?",
+            (status, generated, run_date)
+        )
+    conn.commit()
+    conn.close()
+
+
+def parse_window(window):
+    """
+    解析时间窗口
+
+    Args:
+        window (str): 形如 "02:00-05:00"，结束时间早于开始时间表示跨午夜
+
+    Returns:
+        tuple: (开始时刻距午夜的分钟数, 窗口长度分钟数)
+    """
+    start_s, end_s = window.split("-")
+    sh, sm = (int(x) for x in start_s.strip().split(":"))
+    eh, em = (int(x) for x in end_s.strip().split(":"))
+    start = sh * 60 + sm
+    length = (eh * 60 + em - start) % (24 * 60)
+    return start, length or 24 * 60
+
+
+def window_start(day, window):
+    """
+    返回指定日期的窗口开始时间
+
+    Args:
+        day (date): 日期
+        window (str): 时间窗口
+
+    Returns:
+        datetime: 窗口开始时间
+    """
+    start, _ = parse_window(window)
+    return datetime(day.year, day.month, day.day) + timedelta(minutes=start)
+
+
+def due_run_date(now, window):
+    """
+    返回当前应当已经完成的最近一次运行的日期
+    今天的窗口已经开始则为今天，否则为昨天
+
+    Args:
+        now (datetime): 当前时间
+        window (str): 时间窗口
+
+    Returns:
+        date: 运行日期
+    """
+    today = now.date()
+    return today if now >= window_start(today, window) else today - timedelta(days=1)
+
+
+def next_run_time(now, window, jitter_minutes):
+    """
+    计算下一次运行时间：下一个窗口开始时间加上随机延迟
+    随机延迟避免多个部署在同一时刻集中调用LLM，且不会超出窗口
+
+    Args:
+        now (datetime): 当前时间
+        window (str): 时间窗口
+        jitter_minutes (int): 随机延迟上限（分钟）
+
+    Returns:
+        tuple: (运行日期, 运行时间)
+    """
+    _, length = parse_window(window)
+    day = due_run_date(now, window) + timedelta(days=1)
+    delay = random.uniform(0, min(jitter_minutes, length))
+    return day, window_start(day, window) + timedelta(minutes=delay)
+
+
+def start_heartbeat(owner):
+    """
+    在后台线程中定期刷新锁心跳，直到返回的事件被设置
+
+    Args:
+        owner (str): 锁持有者标识
+
+    Returns:
+        threading.Event: 设置后心跳线程退出
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                acquire_lock(owner)
+            except Exception as e:
+                print("[scheduler] 刷新锁心跳失败:", e)
+
+    threading.Thread(target=beat, name="scheduler-heartbeat", daemon=True).start()
+    return stop
+
+
+def run_for_date(run_date, target, owner):
+    """
+    执行一次预生成：把未发放的预生成阅读补足到 target 篇
+    连续补跑多天时不会重复堆积
+
+    Args:
+        run_date (date): 运行日期
+        target (int): 未发放阅读的目标篇数
+        owner (str): 锁持有者标识，生成期间由心跳线程定期刷新，每篇开始前确认仍持有锁
+
+    Returns:
+        int: 本次生成的篇数
+    """
+    key = run_date.isoformat()
+    record_run(key, "running")
+    generated = 0
+    heartbeat = start_heartbeat(owner)
+    try:
+        while agent.count_prepared_readings() < target and acquire_lock(owner):
+            content = agent.generate_reading()
+            if not content:
+                break
+            agent.save_prepared_reading(content, key)
+            generated += 1
+    except Exception as e:
+        print(f"[scheduler] {key} 生成失败:", e)
+        record_run(key, "failed", generated)
+        return generated
+    finally:
+        heartbeat.set()
+
+    status = "done" if agent.count_prepared_readings() >= target else "failed"
+    record_run(key, status, generated)
+    print(f"[scheduler] {key} 生成 {generated} 篇，状态 {status}")
+    if generated:
+        agent.notify(f"{generated} English reading(s) prepared for today.", wait=NOTIFY_WAIT_SECONDS)
+    return generated
+
+
+def catch_up(config, owner):
+    """
+    补跑错过的运行：如果最近一次应当完成的运行没有成功，立即执行
+
+    Args:
+        config (dict): 配置字典
+        owner (str): 锁持有者标识
+    """
+    run_date = due_run_date(datetime.now(), config["SCHEDULE_WINDOW"])
+    if get_run_status(run_date.isoformat()) != "done":
+        print(f"[scheduler] 补跑 {run_date.isoformat()}")
+        run_for_date(run_date, config["SCHEDULE_READINGS"], owner)
+
+
+def sleep_until(when, owner):
+    """
+    休眠到指定时间，期间定期刷新锁心跳
+
+    Args:
+        when (datetime): 唤醒时间
+        owner (str): 锁持有者标识
+
+    Returns:
+        bool: 正常到达唤醒时间返回True；锁被其他调度器抢占时返回False
+    """
+    while True:
+        remaining = (when - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, HEARTBEAT_SECONDS))
+        if not acquire_lock(owner):
+            return False
+
+
+def main(config, once=False):
+    """
+    调度器入口
+
+    Args:
+        config (dict): 配置字典
+        once (bool): 只补跑到期的任务，然后退出
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not acquire_lock(owner):
+        print("[scheduler] 已有调度器在运行（同一数据库只允许一个），退出")
+        return
+
+    try:
+        catch_up(config, owner)
+        if once:
+            return
+        while True:
+            run_date, when = next_run_time(datetime.now(), config["SCHEDULE_WINDOW"],
+                                           config["SCHEDULE_JITTER_MINUTES"])
+            print(f"[scheduler] 下一次运行：{when:%Y-%m-%d %H:%M}")
+            if not sleep_until(when, owner):
+                print("[scheduler] 调度器锁已被其他进程持有，退出")
+                return
+            if get_run_status(run_date.isoformat()) != "done":
+                run_for_date(run_date, config["SCHEDULE_READINGS"], owner)
+    except KeyboardInterrupt:
+        print("[scheduler] 已停止")
+    finally:
+        release_lock(owner)
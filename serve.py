@@ -0,0 +1,25 @@
+# serve.py - 生产服务器入口（waitress，支持 Windows）
+# 用法：python serve.py
+#
+# waitress 为单进程多线程服务器。请求大部分时间都在等待LLM，
+# 所以线程数可以远大于CPU核数
+
+import os
+
+from waitress import serve
+
+from wsgi import app
+
+
+if __name__ == '__main__':
+    serve(
+        app,
+        host=os.getenv("WEB_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEB_PORT", "80")),
+        # 同时处理的请求数，每个等待LLM的请求占用一个线程
+        threads=int(os.getenv("WEB_THREADS", "64")),
+        # 允许的最大连接数（包括等待中的连接）
+        connection_limit=int(os.getenv("WEB_CONNECTION_LIMIT", "500")),
+        # 空闲连接的超时时间（秒）
+        channel_timeout=int(os.getenv("WEB_CHANNEL_TIMEOUT", "120")),
+    )
@@ -0,0 +1,23 @@
+# conftest.py - 测试公用的夹具
+# 各模块直接按文件名导入（import db），把项目根目录加入 sys.path，直接运行 pytest 也能找到
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    使用临时目录中的新数据库（已执行全部迁移），测试结束后恢复 DB_PATH
+    """
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    # 不从当前目录下的旧去重数据库导入记录
+    monkeypatch.setattr(db, "LEGACY_DEDUP_DB_PATH", str(tmp_path / "missing.db"))
+    db.init_db()
+    return db.DB_PATH
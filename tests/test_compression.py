@@ -0,0 +1,97 @@
+# test_compression.py - 响应压缩和阅读材料缓存头的回归用例
+# 通过 Flask 测试客户端请求 /api/passages/<id>：按 Accept-Encoding 协商压缩，ETag 和 304
+
+import gzip
+
+import pytest
+
+import compression
+import db
+from app import create_app
+from passage import parse_passage
+
+TEXT = (
+    "Title: Markets\n\n"
+    + "\n\n".join(f"Paragraph {i} " + "markets respond to incentives and information. " * 20 for i in range(5))
+    + "\n\nQuestions\n1. What do markets respond to?\n2. Why does information matter?"
+)
+
+
+@pytest.fixture
+def client(tmp_path, temp_db):
+    app = create_app({
+        "DB_PATH": temp_db,
+        "SAVE_FOLDER": str(tmp_path),
+        "PROFILE_DIR": str(tmp_path / "profiles"),
+        "PROFILE_SAMPLE_RATE": 0,
+        "JOB_WORKERS": 0,
+    })
+    return app.test_client()
+
+
+@pytest.fixture
+def passage_url(temp_db):
+    return f"/api/passages/{db.save_passage('s1', TEXT, parse_passage(TEXT))}"
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding("gzip, deflate") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("") is None
+    assert compression.choose_encoding("gzip;q=0, br;q=0") is None
+    if compression.brotli:
+        assert compression.choose_encoding("gzip, deflate, br") == "br"
+        assert compression.choose_encoding("br;q=0.5, gzip") == "gzip"
+    else:
+        assert compression.choose_encoding("br, gzip") == "gzip"
+
+
+def test_uncompressed_response_keeps_strong_etag(client, passage_url):
+    response = client.get(passage_url, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.vary
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.cache_control.immutable
+    assert response.get_json()["title"] == "Markets"
+
+
+def test_gzip_response(client, passage_url):
+    plain = client.get(passage_url, headers={"Accept-Encoding": "identity"})
+    response = client.get(passage_url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    # 压缩后为弱 ETag，值与未压缩的强 ETag 相同
+    assert response.get_etag() == (plain.get_etag()[0], True)
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli not installed")
+def test_brotli_response(client, passage_url):
+    plain = client.get(passage_url, headers={"Accept-Encoding": "identity"})
+    response = client.get(passage_url, headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert compression.brotli.decompress(response.get_data()) == plain.get_data()
+
+
+def test_small_response_not_compressed(client):
+    response = client.get("/api/passages/999", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 404
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("accept_encoding", ["identity", "gzip"])
+def test_if_none_match_returns_304(client, passage_url, accept_encoding):
+    headers = {"Accept-Encoding": accept_encoding}
+    first = client.get(passage_url, headers=headers)
+    # 客户端回传收到的 ETag（压缩响应为弱 ETag）
+    headers["If-None-Match"] = first.headers["ETag"]
+    response = client.get(passage_url, headers=headers)
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == first.headers["ETag"].removeprefix("W/")
+    assert "Content-Encoding" not in response.headers
+
+    headers["If-None-Match"] = '"stale"'
+    assert client.get(passage_url, headers=headers).status_code == 200
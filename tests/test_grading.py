@@ -0,0 +1,89 @@
+# test_grading.py - 答案批改的回归用例
+# LLM 返回格式的容错、分数取值，以及相同答案命中缓存时不再调用LLM
+
+import json
+
+import db
+import grading
+from passage import parse_passage
+
+TEXT = (
+    "Title: Markets\n\n"
+    + "\n\n".join("Markets respond to incentives and information. " * 10 for _ in range(3))
+    + "\n\nQuestions\n1. What do markets respond to?\n2. Why does information matter?"
+)
+
+
+def grades_json(*scores):
+    return json.dumps({"grades": [
+        {"score": s, "expected": "incentives", "feedback": "Good."} for s in scores
+    ]})
+
+
+def test_normalize_answer():
+    assert grading.normalize_answer("  Incentives   and\nINFORMATION ") == "incentives and information"
+    assert grading.normalize_answer(None) == ""
+    assert len(grading.normalize_answer("x" * 5000)) == grading.MAX_ANSWER_LENGTH
+
+
+def test_answers_hash():
+    answers = ["b", "incentives"]
+    assert grading.answers_hash(1, answers) == grading.answers_hash(1, list(answers))
+    assert grading.answers_hash(1, answers) != grading.answers_hash(2, answers)
+    assert grading.answers_hash(1, answers) != grading.answers_hash(1, ["incentives", "b"])
+
+
+def test_parse_fenced_json():
+    grades = grading.parse_grades("```json\n" + grades_json(1, 0) + "\n```", 2)
+    assert [g["score"] for g in grades] == [1, 0]
+    assert grades[0] == {
+        "question": 1, "score": 1, "correct": True, "expected": "incentives", "feedback": "Good.",
+    }
+
+
+def test_parse_json_with_extra_prose():
+    text = "Here are the grades:\n" + grades_json(0.5, 1) + "\nLet me know if you need more."
+    assert [g["score"] for g in grading.parse_grades(text, 2)] == [0.5, 1]
+
+
+def test_parse_wrong_count_or_invalid():
+    assert grading.parse_grades(grades_json(1, 1, 1), 2) is None
+    assert grading.parse_grades(grades_json(1), 2) is None
+    assert grading.parse_grades("no json here", 2) is None
+    assert grading.parse_grades('{"grades": "none"}', 2) is None
+    assert grading.parse_grades(None, 2) is None
+
+
+def test_out_of_range_scores_snap():
+    grades = grading.parse_grades(grades_json(2, -1, 0.4, 0.8, "0.6"), 5)
+    assert [g["score"] for g in grades] == [1, 0, 0.5, 1, 0.5]
+    assert [g["correct"] for g in grades] == [True, False, False, True, False]
+
+
+def test_cache_hit_skips_llm(temp_db, monkeypatch):
+    passage_id = db.save_passage("s1", TEXT, parse_passage(TEXT))
+    passage = db.get_passage(passage_id)
+    calls = []
+
+    def fake_generate(prompt, max_tokens=800, json_output=False):
+        calls.append(prompt)
+        return grades_json(1, 0.5)
+
+    monkeypatch.setattr(grading, "generate_code", fake_generate)
+    first = grading.grade_answers("s1", passage, ["Incentives", "it is  useful"])
+    assert first["score"] == 1.5 and first["total"] == 2 and not first["cached"]
+
+    # 规范化后相同的答案命中缓存
+    second = grading.grade_answers("s2", passage, [" incentives ", "It is useful"])
+    assert second["cached"]
+    assert second["grades"] == first["grades"]
+    assert len(calls) == 1
+    assert len(db.get_answer_submissions("s2")) == 1
+
+
+def test_unparseable_response_is_not_cached(temp_db, monkeypatch):
+    passage_id = db.save_passage("s1", TEXT, parse_passage(TEXT))
+    passage = db.get_passage(passage_id)
+    monkeypatch.setattr(grading, "generate_code", lambda *a, **k: "Sorry, I cannot grade this.")
+    assert grading.grade_answers("s1", passage, ["a", "b"]) is None
+    assert db.get_answer_submissions("s1") == []
@@ -0,0 +1,79 @@
+# test_jobs.py - 生成任务队列的回归用例
+# 去重、心跳超时后重新领取、超过最大领取次数后失败、结果只对提交任务的会话可见
+
+import db
+import jobs
+
+
+def make_stale(job_id):
+    conn = db.connect()
+    conn.execute("UPDATE generation_jobs SET heartbeat = datetime('now', '-1 hour') WHERE id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+
+
+def test_same_idempotency_key_returns_existing_job(temp_db):
+    job_id, created = db.enqueue_generation_job("s1", "task", "key-1")
+    assert created
+    db.finish_generation_job(db.claim_generation_job("w1", 300, 3)["id"], result={"response": "ok"})
+    # 任务已完成，相同的幂等键仍返回原任务
+    assert db.enqueue_generation_job("s1", "task", "key-1") == (job_id, False)
+    # 幂等键按会话区分
+    assert db.enqueue_generation_job("s2", "task", "key-1")[1]
+
+
+def test_active_job_blocks_new_submissions(temp_db):
+    job_id, _ = db.enqueue_generation_job("s1", "task")
+    assert db.enqueue_generation_job("s1", "task", "other-key") == (job_id, False)
+    db.claim_generation_job("w1", 300, 3)
+    assert db.enqueue_generation_job("s1", "task") == (job_id, False)
+    db.finish_generation_job(job_id, result={"response": "ok"})
+    new_id, created = db.enqueue_generation_job("s1", "task")
+    assert created and new_id != job_id
+
+
+def test_stale_job_is_reclaimed(temp_db):
+    job_id, _ = db.enqueue_generation_job("s1", "task")
+    assert db.claim_generation_job("w1", 300, 3)["id"] == job_id
+    # 心跳未超时，不能被其他执行者领取
+    assert db.claim_generation_job("w2", 300, 3) is None
+    make_stale(job_id)
+    assert db.claim_generation_job("w2", 300, 3)["id"] == job_id
+    # 原执行者的心跳不再刷新已被重新领取的任务
+    make_stale(job_id)
+    db.heartbeat_generation_jobs("w1", [job_id])
+    assert db.claim_generation_job("w3", 300, 3)["id"] == job_id
+
+
+def test_job_fails_after_max_attempts(temp_db):
+    job_id, _ = db.enqueue_generation_job("s1", "task")
+    for worker in ("w1", "w2"):
+        assert db.claim_generation_job(worker, 300, 2)["id"] == job_id
+        make_stale(job_id)
+    assert db.claim_generation_job("w3", 300, 2) is None
+    job = db.get_generation_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "worker stopped"
+
+
+def test_finish_ignores_job_that_is_not_running(temp_db):
+    job_id, _ = db.enqueue_generation_job("s1", "task")
+    # 未领取的任务不能被标记完成
+    db.finish_generation_job(job_id, result={"response": "early"})
+    assert db.get_generation_job(job_id)["status"] == "queued"
+    db.claim_generation_job("w1", 300, 3)
+    db.finish_generation_job(job_id, result={"response": "first"})
+    db.finish_generation_job(job_id, error="late failure")
+    job = db.get_generation_job(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"response": "first"}
+
+
+def test_get_status_only_for_owning_session(temp_db):
+    job_id = jobs.submit("s1", "task")
+    assert jobs.get_status(job_id, "s2") is None
+    assert jobs.get_status(job_id + 1, "s1") is None
+    assert jobs.get_status(job_id, "s1") == {"job_id": job_id, "status": "queued"}
+    db.claim_generation_job("w1", 300, 3)
+    db.finish_generation_job(job_id, result={"response": "ok"})
+    assert jobs.get_status(job_id, "s1") == {"job_id": job_id, "status": "done", "response": "ok"}
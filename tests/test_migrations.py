@@ -0,0 +1,83 @@
+# test_migrations.py - 数据库迁移的回归用例
+# 在旧版（无 schema_version）的数据库上执行 init_db()：数据保留、旧去重表并入 sent_content，再次执行不产生变化
+
+import sqlite3
+
+import db
+
+# 旧版 db.py 和 agent.py 在同一个数据库中创建的表
+LEGACY_SCHEMA = """
+CREATE TABLE learning_state (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT, step INTEGER, content TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE sent_content (id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash TEXT UNIQUE);
+CREATE TABLE chat_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, user_message TEXT, ai_response TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, message_type TEXT DEFAULT 'chat'
+);
+CREATE TABLE sent_hash (id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT UNIQUE);
+INSERT INTO learning_state (topic, step, content) VALUES ('economics', 3, 'passage text');
+INSERT INTO sent_content (content_hash) VALUES ('h-shared'), ('h-content');
+INSERT INTO chat_history (session_id, user_message, ai_response, message_type)
+    VALUES ('s1', 'hello', 'hi', 'chat'), ('s1', 'task', 'passage', 'task');
+INSERT INTO sent_hash (hash) VALUES ('h-shared'), ('h-agent');
+"""
+
+
+def snapshot(path):
+    conn = sqlite3.connect(path)
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    state = {
+        "tables": tables,
+        "versions": conn.execute("SELECT version, name FROM schema_version ORDER BY version").fetchall(),
+        "hashes": sorted(r[0] for r in conn.execute("SELECT content_hash FROM sent_content")),
+        "chat": conn.execute("SELECT session_id, user_message, ai_response, message_type FROM chat_history").fetchall(),
+        "state": conn.execute("SELECT topic, step, content FROM learning_state").fetchall(),
+    }
+    conn.close()
+    return state
+
+
+def test_migrates_legacy_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "english_learning.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    # 旧 dedup.py 使用的独立数据库
+    legacy_path = str(tmp_path / "learning_assistant.db")
+    conn = sqlite3.connect(legacy_path)
+    conn.executescript(
+        "CREATE TABLE pushed_code (id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT UNIQUE);"
+        "INSERT INTO pushed_code (hash) VALUES ('h-agent'), ('h-legacy');"
+    )
+    conn.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setattr(db, "LEGACY_DEDUP_DB_PATH", legacy_path)
+    assert db.get_schema_version() == 0
+    db.init_db()
+
+    assert db.get_schema_version() == len(db.MIGRATIONS)
+    state = snapshot(path)
+    assert state["versions"] == [(version, name) for version, name, _ in db.MIGRATIONS]
+    assert "sent_hash" not in state["tables"]
+    assert {"generation_jobs", "answer_grades", "passages"} <= set(state["tables"])
+    assert state["hashes"] == ["h-agent", "h-content", "h-legacy", "h-shared"]
+    assert state["chat"] == [("s1", "hello", "hi", "chat"), ("s1", "task", "passage", "task")]
+    assert state["state"] == [("economics", 3, "passage text")]
+    # 旧数据库只读导入，保持不变
+    conn = sqlite3.connect(legacy_path)
+    assert conn.execute("SELECT COUNT(*) FROM pushed_code").fetchone()[0] == 2
+    conn.close()
+
+    # 再次执行不重复迁移，也不改变数据
+    db.init_db()
+    assert snapshot(path) == state
+
+
+def test_fresh_database(temp_db):
+    assert db.get_schema_version() == len(db.MIGRATIONS)
+    db.init_db()
+    assert db.get_schema_version() == len(db.MIGRATIONS)
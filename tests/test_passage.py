@@ -0,0 +1,76 @@
+# test_passage.py - 阅读材料解析和规格检查的回归用例
+# LLM 常见的 Markdown 输出（加粗题号、### 标题）不应影响题目计数
+
+import analytics
+from passage import clean_markdown, parse_passage
+
+BODY = "\n\n".join(
+    f"Paragraph {i} " + "markets respond to incentives and information. " * 20 for i in range(5)
+)
+QUESTIONS = [f"What does paragraph {i} suggest about markets?" for i in range(1, 7)]
+
+
+def build(title, heading, numbering):
+    questions = "\n".join(numbering.format(n=i) + " " + q for i, q in enumerate(QUESTIONS, 1))
+    return f"{title}\n\n{BODY}\n\n{heading}\n{questions}"
+
+
+def test_plain_format():
+    parsed = parse_passage(build("Title: Markets", "Questions", "{n}."))
+    assert parsed["title"] == "Markets"
+    assert len(parsed["paragraphs"]) == 5
+    assert len(parsed["questions"]) == 6
+
+
+def test_bold_numbering_and_markdown_heading_raw():
+    parsed = parse_passage(build("# Markets", "### Comprehension Questions", "**{n}.**"))
+    assert len(parsed["questions"]) == 6
+    assert not any("Comprehension" in q for q in parsed["questions"])
+
+
+def test_bold_heading_raw():
+    parsed = parse_passage(build("**Markets**", "**Questions:**", "{n})"))
+    assert len(parsed["questions"]) == 6
+
+
+def test_separator_format_with_markdown():
+    text = f"## Markets\n---\n{BODY}\n---\n### Questions\n" + "\n".join(
+        f"**{i}.** {q}" for i, q in enumerate(QUESTIONS, 1)
+    )
+    parsed = parse_passage(clean_markdown(text))
+    assert parsed["title"] == "Markets"
+    assert len(parsed["questions"]) == 6
+
+
+def test_spec_gate_accepts_cleaned_markdown():
+    text = clean_markdown(build("# Markets", "### Comprehension Questions", "**{n}.**"))
+    stats = analytics.analyze(text)
+    assert stats["question_count"] == 6
+    assert not any("questions" in p for p in analytics.check_spec(stats))
+
+
+def spec(word_count, question_count=6):
+    return analytics.check_spec({"word_count": word_count, "question_count": question_count})
+
+
+def test_spec_word_bounds():
+    assert spec(540) == [] and spec(990) == []
+    assert spec(539) == ["word count 539 outside 540-990"]
+    assert spec(991) == ["word count 991 outside 540-990"]
+
+
+def test_spec_question_bounds():
+    assert spec(700, 5) == [] and spec(700, 8) == []
+    assert spec(700, 4) == ["4 questions, expected 5-8"]
+    assert spec(700, 9) == ["9 questions, expected 5-8"]
+    assert len(spec(100, 0)) == 2
+
+
+def test_spec_configured_word_limits(monkeypatch):
+    # 先记录原值，测试结束后由 monkeypatch 恢复
+    monkeypatch.setattr(analytics, "MIN_WORDS", analytics.MIN_WORDS)
+    monkeypatch.setattr(analytics, "MAX_WORDS", analytics.MAX_WORDS)
+    analytics.configure({"PASSAGE_MIN_WORDS": 300, "PASSAGE_MAX_WORDS": 600})
+    assert spec(300) == [] and spec(600) == []
+    assert spec(299) == ["word count 299 outside 300-600"]
+    assert spec(990) == ["word count 990 outside 300-600"]
@@ -0,0 +1,78 @@
+# test_scheduler.py - 调度器时间窗口和锁的回归用例
+# 时间计算使用固定的当前时间；跨午夜的窗口属于开始时刻所在的日期
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import db
+import scheduler
+
+
+def test_parse_window():
+    assert scheduler.parse_window("02:00-05:00") == (120, 180)
+    assert scheduler.parse_window(" 02:30 - 03:15 ") == (150, 45)
+    # 跨午夜
+    assert scheduler.parse_window("23:00-02:00") == (1380, 180)
+    # 开始与结束相同表示全天
+    assert scheduler.parse_window("04:00-04:00") == (240, 1440)
+
+
+def test_due_run_date():
+    assert scheduler.due_run_date(datetime(2026, 3, 10, 1, 59), "02:00-05:00") == date(2026, 3, 9)
+    assert scheduler.due_run_date(datetime(2026, 3, 10, 2, 0), "02:00-05:00") == date(2026, 3, 10)
+    assert scheduler.due_run_date(datetime(2026, 3, 10, 23, 30), "02:00-05:00") == date(2026, 3, 10)
+
+
+def test_due_run_date_across_midnight():
+    # 01:00 仍在 3 月 9 日 23:00 开始的窗口内
+    assert scheduler.due_run_date(datetime(2026, 3, 10, 1, 0), "23:00-02:00") == date(2026, 3, 9)
+    assert scheduler.due_run_date(datetime(2026, 3, 10, 23, 0), "23:00-02:00") == date(2026, 3, 10)
+    # 跨年
+    assert scheduler.due_run_date(datetime(2027, 1, 1, 0, 30), "23:00-02:00") == date(2026, 12, 31)
+
+
+@pytest.mark.parametrize("now, window, day, start", [
+    (datetime(2026, 3, 10, 1, 0), "02:00-05:00", date(2026, 3, 10), datetime(2026, 3, 10, 2, 0)),
+    (datetime(2026, 3, 10, 3, 0), "02:00-05:00", date(2026, 3, 11), datetime(2026, 3, 11, 2, 0)),
+    (datetime(2026, 3, 10, 1, 0), "23:00-02:00", date(2026, 3, 10), datetime(2026, 3, 10, 23, 0)),
+    (datetime(2026, 12, 31, 23, 30), "23:00-02:00", date(2027, 1, 1), datetime(2027, 1, 1, 23, 0)),
+])
+def test_next_run_time(monkeypatch, now, window, day, start):
+    monkeypatch.setattr(scheduler.random, "uniform", lambda a, b: a)
+    assert scheduler.next_run_time(now, window, 30) == (day, start)
+    monkeypatch.setattr(scheduler.random, "uniform", lambda a, b: b)
+    assert scheduler.next_run_time(now, window, 30) == (day, start + timedelta(minutes=30))
+
+
+def test_next_run_time_jitter_stays_in_window():
+    now = datetime(2026, 3, 10, 12, 0)
+    start = datetime(2026, 3, 11, 2, 0)
+    for _ in range(200):
+        day, run_at = scheduler.next_run_time(now, "02:00-02:45", 120)
+        assert day == date(2026, 3, 11)
+        assert start <= run_at <= start + timedelta(minutes=45)
+    assert scheduler.next_run_time(now, "02:00-05:00", 0) == (date(2026, 3, 11), start)
+
+
+def test_lock_takeover_after_stale_heartbeat(temp_db):
+    assert scheduler.acquire_lock("a")
+    assert not scheduler.acquire_lock("b")
+    # 持有者刷新心跳
+    assert scheduler.acquire_lock("a")
+
+    conn = db.connect()
+    conn.execute(
+        "UPDATE scheduler_lock SET heartbeat = datetime('now', ?) WHERE name = ?",
+        (f"-{scheduler.LOCK_STALE_SECONDS + 60} seconds", scheduler.LOCK_NAME)
+    )
+    conn.commit()
+    conn.close()
+    assert scheduler.acquire_lock("b")
+    assert not scheduler.acquire_lock("a")
+
+    # 只能释放自己持有的锁
+    scheduler.release_lock("a")
+    assert not scheduler.acquire_lock("a")
+    scheduler.release_lock("b")
+    assert scheduler.acquire_lock("a")
@@ -0,0 +1,11 @@
+# wsgi.py - WSGI 入口
+# 供 gunicorn / waitress 等生产服务器加载：gunicorn -c gunicorn.conf.py wsgi:app
+
+from app import create_app, init_storage, start_job_workers
+
+# 每个工作进程导入时创建一次应用并初始化数据库
+# init_storage() 可以被多个进程同时调用，启动清理只会执行一次
+app = create_app()
+init_storage()
+# 生成任务的工作线程：多个进程通过数据库领取任务，同一任务只会被一个进程执行
+start_job_workers(app)